@@ -0,0 +1,73 @@
+"""
+PDF byte size and render time of pdf-service with and without Thai content.
+
+Renders standard PDFs in-process for an English-only and a bilingual document, once with
+automatic font selection (built-in Helvetica unless the document needs Thai) and once with
+the bundled Thai font forced, and prints size and median render time for each.
+
+    python benchmarks/pdf_font_benchmark.py --iterations 50
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "pdf-service")]
+os.environ.setdefault("SHARED_STATE_URL", "memory://")
+
+# Field names without a Thai label, so the document is English-only end to end
+ENGLISH_DOCUMENT = {
+    "project_summary": "Supply of office laptops for the head office",
+    "buyer": {"name": "Example Co., Ltd.", "phone": "+66 2 000 0000"},
+    "line_items": [
+        {"item": f"Laptop model {i}", "qty": i + 1, "price": 25000 + i * 150}
+        for i in range(30)
+    ],
+    "terms": {"payment": "Net 30", "delivery": "2026-12-01"},
+}
+
+THAI_DOCUMENT = {
+    "project_description": "จัดซื้อคอมพิวเตอร์โน้ตบุ๊กสำหรับสำนักงานใหญ่ / Supply of office laptops",
+    "company_info": {"company_name": "บริษัท ตัวอย่าง จำกัด", "company_phone": "+66 2 000 0000"},
+    "detailed_requirements": [
+        {"description": f"คอมพิวเตอร์โน้ตบุ๊ก รุ่น {i}", "quantity": i + 1, "unit_price": 25000 + i * 150}
+        for i in range(30)
+    ],
+    "terms": {"payment_terms": "ชำระเงินภายใน 30 วัน", "delivery_date": "2026-12-01"},
+}
+
+
+def measure(pdf_service, document, iterations):
+    request = pdf_service.PdfRequest(content={"content": json.dumps(document, ensure_ascii=False)}, title="Benchmark", doc_type="RFQ")
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        pdf = pdf_service.render_standard_pdf(request)
+        timings.append(time.perf_counter() - started)
+    return len(pdf), statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    import main as pdf_service  # registers the Thai font at import
+    print(f"pdf-service import incl. font registration: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    auto_selection = pdf_service.needs_thai_font
+    print(f"{'content':<8} {'fonts':<11} {'bytes':>8} {'median ms':>10}")
+    for label, document in (("english", ENGLISH_DOCUMENT), ("thai", THAI_DOCUMENT)):
+        for mode, selection in (("auto", auto_selection), ("thai-forced", lambda *texts: True)):
+            pdf_service.needs_thai_font = selection
+            size, median_ms = measure(pdf_service, document, args.iterations)
+            print(f"{label:<8} {mode:<11} {size:>8} {median_ms:>10.1f}")
+    pdf_service.needs_thai_font = auto_selection
+
+
+if __name__ == "__main__":
+    main()
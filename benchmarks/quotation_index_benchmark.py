@@ -0,0 +1,109 @@
+"""
+Ingestion and lookup times of the quotation price-history index.
+
+Fills a fresh index with synthetic quotations (default 300,000 line items from 200 vendors
+over three years), then times price-range and price-history lookups for a set of item
+descriptions, with and without vendor and date filters.
+
+    python benchmarks/quotation_index_benchmark.py --rows 300000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from common.quotation_index import QuotationIndex  # noqa: E402
+
+PRODUCTS = ["laptop", "monitor", "docking station", "office chair", "standing desk", "printer toner",
+            "network switch", "wireless router", "ups battery", "projector", "คอมพิวเตอร์โน้ตบุ๊ก", "กระดาษ A4"]
+BRANDS = ["Dell", "HP", "Lenovo", "Asus", "Acer", "Cisco", "APC", "Epson", "Brother", "Logitech"]
+DETAILS = ["14 inch", "27 inch 4K", "USB-C", "ergonomic", "black", "1500VA", "24 port gigabit", "wifi 6", "pack of 5", "3 year warranty"]
+ITEMS_PER_QUOTATION = 10
+
+QUERIES = [
+    "Dell laptop 14 inch",
+    "27 inch 4K monitor",
+    "USB-C docking station",
+    "ergonomic office chair",
+    "24 port gigabit network switch",
+    "คอมพิวเตอร์โน้ตบุ๊ก",
+]
+
+
+def synthetic_quotations(rows, seed=7):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=3 * 365)
+    for number in range(rows // ITEMS_PER_QUOTATION):
+        items = []
+        for _ in range(ITEMS_PER_QUOTATION):
+            product = rng.choice(PRODUCTS)
+            price = round(rng.uniform(500, 60000), 2)
+            quantity = rng.randint(1, 50)
+            items.append({
+                "description": f"{rng.choice(BRANDS)} {product} {rng.choice(DETAILS)} model {rng.randint(100, 999)}",
+                "quantity": f"{quantity} pcs",
+                "unit_price": f"฿{price:,.2f}",
+                "total_price": f"฿{price * quantity:,.2f}",
+            })
+        yield {
+            "vendor_name": f"Vendor {rng.randint(1, 200)} Co., Ltd.",
+            "file_name": f"quotation-{number}.pdf",
+            "quote_details": {"quote_number": f"Q-{number}", "date": (start + timedelta(days=rng.randint(0, 3 * 365))).isoformat()},
+            "items": items,
+        }
+
+
+def timed(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, max(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300000, help="line items to index")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = QuotationIndex(os.path.join(directory, "quotations.db"))
+        started = time.perf_counter()
+        batch = []
+        for quotation in synthetic_quotations(args.rows):
+            batch.append(quotation)
+            if len(batch) == 1000:
+                index.ingest_many(batch)
+                batch = []
+        if batch:
+            index.ingest_many(batch)
+        elapsed = time.perf_counter() - started
+        print(f"ingested {args.rows} line items in {elapsed:.1f} s ({args.rows / elapsed:,.0f} rows/s)")
+
+        since = (date.today() - timedelta(days=365)).isoformat()
+        cases = [
+            ("range", lambda q: index.price_range(q)),
+            ("range vendor", lambda q: index.price_range(q, vendor="Vendor 42 Co., Ltd.")),
+            ("range last year", lambda q: index.price_range(q, since=since)),
+            ("range THB", lambda q: index.price_range(q, currency="THB")),
+            ("history", lambda q: index.price_history(q)),
+        ]
+        print(f"{'query':<32} {'lookup':<16} {'rows':>7} {'median ms':>10} {'max ms':>8}")
+        for query in QUERIES:
+            rows = index.price_range(query)["count"]
+            for label, lookup in cases:
+                median_ms, max_ms = timed(lambda: lookup(query), args.iterations)
+                print(f"{query:<32} {label:<16} {rows:>7} {median_ms:>10.2f} {max_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Throughput of pdf-service as the number of uvicorn workers grows.
+
+Starts `uvicorn main:app --workers N` for each N, drives /generate-standard-pdf (CPU-bound
+ReportLab rendering) from a pool of client threads for a fixed duration and prints
+requests/second per worker count.
+
+    python benchmarks/scaling_benchmark.py --workers 1 2 4 --duration 10
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_DOCUMENT = {
+    "project_description": "Supply of office laptops for the Bangkok head office",
+    "detailed_requirements": [
+        {"description": f"Laptop model {i}", "quantity": i + 1, "unit_price": 25000 + i * 150,
+         "specifications": "14 inch, 16GB RAM, 512GB SSD"}
+        for i in range(40)
+    ],
+    "terms": {"payment_terms": "Net 30", "delivery_date": "2026-12-01", "warranty": "3 years"},
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(f"{url}/docs", timeout=1)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def measure(workers, duration, concurrency, state_dir):
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, PYTHONPATH=ROOT,
+               SHARED_STATE_URL=f"sqlite:///{os.path.join(state_dir, f'state-{workers}.db')}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.join(ROOT, "pdf-service"), env=env,
+    )
+    try:
+        _wait_until_ready(url)
+        payload = {"content": {"content": json.dumps(SAMPLE_DOCUMENT)}, "title": "Benchmark", "doc_type": "RFQ"}
+        completed = [0] * concurrency
+        stop_at = time.time() + duration
+
+        def client(index):
+            session = requests.Session()
+            while time.time() < stop_at:
+                session.post(f"{url}/generate-standard-pdf", json=payload, timeout=60).raise_for_status()
+                completed[index] += 1
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(completed) / duration
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        baseline = None
+        print(f"{'workers':>7}  {'req/s':>8}  {'speedup':>7}")
+        for workers in args.workers:
+            throughput = measure(workers, args.duration, args.concurrency, state_dir)
+            baseline = baseline or throughput
+            print(f"{workers:>7}  {throughput:>8.1f}  {throughput / baseline:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Helpers shared by the backend services (copied into each service image)."""
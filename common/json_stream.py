@@ -0,0 +1,206 @@
+import json
+import re
+from typing import Any, List, Tuple
+
+_LITERALS = ("true", "false", "null")
+_LITERAL_CHARS = set("0123456789+-.eEtruefalsn")
+_INCOMPLETE_ESCAPE = re.compile(r"\\(u[0-9a-fA-F]{0,3})?$")
+
+
+class _Frame:
+    __slots__ = ("closer", "expect", "start")
+
+    def __init__(self, closer: str):
+        self.closer = closer
+        # object: key -> colon -> value -> comma; array: value -> comma
+        self.expect = "key" if closer == "}" else "value"
+        # index in the output where the current member/element began, None between members
+        self.start = None
+
+
+class IncrementalJSONParser:
+    """
+    Tolerant, incremental JSON parser for streamed LLM output.
+
+    `feed()` accepts text chunks and returns the top-level (key, value) sections of the
+    root object that completed in that chunk. `close()` repairs whatever is left
+    (unterminated strings, dangling keys, trailing commas, unclosed brackets), returns the
+    final sections and stores the repaired document in `result`.
+    Text before the first '{' or '[' (prose, ```json fences) and after the root closes is ignored.
+    """
+
+    def __init__(self):
+        self.result = None
+        self._out: List[str] = []
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._string_is_key = False
+        self._string_start = 0
+        self._escape = False
+        self._literal: List[str] = []
+        self._pending_comma = False
+        self._member_start = 0
+        self._sections: List[Tuple[str, Any]] = []
+
+    # --- Public API ---
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        for char in chunk:
+            if self._done:
+                break
+            self._consume(char)
+        return self._take_sections()
+
+    def close(self) -> List[Tuple[str, Any]]:
+        if self._started and not self._done:
+            if self._in_string:
+                self._in_string = False
+                if not self._string_is_key:
+                    text = _INCOMPLETE_ESCAPE.sub("", "".join(self._out[self._string_start:]))
+                    self._out[self._string_start:] = [text, '"']
+                    self._value_complete()
+            elif self._literal:
+                self._finish_literal(at_end=True)
+            while self._stack:
+                self._close_frame()
+        if self._started:
+            try:
+                self.result = json.loads("".join(self._out), strict=False)
+            except json.JSONDecodeError:
+                self.result = None
+        return self._take_sections()
+
+    # --- Scanner ---
+    def _take_sections(self):
+        sections, self._sections = self._sections, []
+        return sections
+
+    def _consume(self, char: str):
+        if not self._started:
+            if char in "{[":
+                self._started = True
+                self._open(char)
+            return
+
+        if self._in_string:
+            self._out.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._string_is_key:
+                    self._stack[-1].expect = "colon"
+                else:
+                    self._value_complete()
+            return
+
+        if self._literal:
+            if char in _LITERAL_CHARS:
+                self._literal.append(char)
+                return
+            self._finish_literal()
+
+        frame = self._stack[-1]
+        if char.isspace():
+            return
+        if char in "}]":
+            self._close_frame()
+            return
+        if char == ",":
+            if frame.expect == "comma":
+                self._pending_comma = True
+                frame.expect = "key" if frame.closer == "}" else "value"
+            return
+        if char == ":":
+            if frame.expect == "colon":
+                self._out.append(":")
+                frame.expect = "value"
+            return
+
+        if frame.expect == "comma":
+            # Missing comma between members: insert one
+            self._pending_comma = True
+            frame.expect = "key" if frame.closer == "}" else "value"
+
+        if frame.expect == "key":
+            if char == '"':
+                self._begin_item(frame)
+                if len(self._stack) == 1:
+                    self._member_start = len(self._out)
+                self._begin_string(is_key=True)
+            return
+        if frame.expect != "value":
+            return
+
+        if frame.closer == "]":
+            self._begin_item(frame)
+        if char in "{[":
+            self._open(char)
+        elif char == '"':
+            self._begin_string(is_key=False)
+        elif char in _LITERAL_CHARS:
+            self._literal = [char]
+
+    def _begin_item(self, frame: _Frame):
+        frame.start = len(self._out)
+        if self._pending_comma:
+            self._out.append(",")
+            self._pending_comma = False
+
+    def _begin_string(self, is_key: bool):
+        self._out.append('"')
+        self._in_string = True
+        self._string_is_key = is_key
+        self._string_start = len(self._out)
+        self._escape = False
+
+    def _open(self, char: str):
+        self._out.append(char)
+        self._stack.append(_Frame("}" if char == "{" else "]"))
+
+    def _close_frame(self):
+        frame = self._stack[-1]
+        if frame.start is not None:
+            # Dangling key, colon or comma: drop the incomplete member
+            del self._out[frame.start:]
+        self._pending_comma = False
+        self._out.append(frame.closer)
+        self._stack.pop()
+        self._value_complete()
+
+    def _finish_literal(self, at_end: bool = False):
+        token = "".join(self._literal)
+        self._literal = []
+        if at_end:
+            token = next((lit for lit in _LITERALS if lit.startswith(token)), token.rstrip(".eE+-"))
+        try:
+            json.loads(token)
+        except json.JSONDecodeError:
+            return
+        self._out.append(token)
+        self._value_complete()
+
+    def _value_complete(self):
+        if not self._stack:
+            self._done = True
+            return
+        frame = self._stack[-1]
+        frame.expect = "comma"
+        frame.start = None
+        if len(self._stack) == 1 and frame.closer == "}":
+            member = "".join(self._out[self._member_start:])
+            try:
+                self._sections.extend(json.loads("{" + member + "}", strict=False).items())
+            except json.JSONDecodeError:
+                pass
+
+
+def repair_json(text: str) -> Any:
+    """Parses possibly truncated or malformed JSON text; returns None when it holds no JSON at all."""
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    parser.close()
+    return parser.result
@@ -0,0 +1,322 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_INDEX_PATH = os.path.join(tempfile.gettempdir(), "procurement-quotations.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotation (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    vendor TEXT NOT NULL,
+    vendor_norm TEXT NOT NULL,
+    file_name TEXT,
+    quote_number TEXT,
+    quote_date TEXT,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS line_item (
+    id INTEGER PRIMARY KEY,
+    quotation_id INTEGER NOT NULL REFERENCES quotation (id),
+    vendor TEXT NOT NULL,
+    vendor_norm TEXT NOT NULL,
+    quote_date TEXT,
+    description TEXT NOT NULL,
+    quantity REAL,
+    unit_price REAL,
+    total_price REAL,
+    raw_unit_price TEXT,
+    currency TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_line_item_vendor ON line_item (vendor_norm, quote_date);
+CREATE INDEX IF NOT EXISTS ix_line_item_date ON line_item (quote_date);
+CREATE INDEX IF NOT EXISTS ix_line_item_unit_price ON line_item (unit_price);
+CREATE VIRTUAL TABLE IF NOT EXISTS line_item_fts USING fts5 (
+    description, content='line_item', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+_NUMBER = re.compile(r"-?\d[\d,.]*")
+_RANGE = re.compile(r"\d\s*[-–]\s*\d")
+_THOUSANDS_COMMAS = re.compile(r"-?\d{1,3}(?:,\d{3})+")
+_WORD_CHARACTER = re.compile(r"\w")
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%d.%m.%Y", "%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%d %b %Y")
+_CURRENCY_CODE = re.compile(r"\b(THB|USD|EUR|GBP|JPY|CNY|SGD|HKD|MYR|AUD)\b", re.IGNORECASE)
+# Checked in order, so "S$" and "HK$" are not read as US dollars
+_CURRENCY_MARKS = (("บาท", "THB"), ("฿", "THB"), ("HK$", "HKD"), ("S$", "SGD"), ("US$", "USD"), ("$", "USD"),
+                   ("€", "EUR"), ("£", "GBP"), ("¥", "JPY"))
+
+
+def parse_amount(value: Any) -> Optional[float]:
+    """
+    Parses prices and quantities such as 1200, '฿1,234.50', '1.234,50 €', '12,5 kg' or '10 pcs'.
+    A comma followed by groups of three digits separates thousands, otherwise it is a decimal
+    comma. Ranges such as '2-3 weeks' are not a single amount and give None.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str) or _RANGE.search(value):
+        return None
+    match = _NUMBER.search(value)
+    if not match:
+        return None
+    number = match.group().rstrip(",.")
+    if "," in number and "." in number:
+        if number.rfind(",") > number.rfind("."):
+            number = number.replace(".", "").replace(",", ".")
+        else:
+            number = number.replace(",", "")
+    elif "," in number:
+        number = number.replace(",", "") if _THOUSANDS_COMMAS.fullmatch(number) else number.replace(",", ".")
+    elif number.count(".") > 1:
+        number = number.replace(".", "")
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+
+def parse_date(value: Any) -> Optional[str]:
+    """Normalises a quote date to ISO format; None when it cannot be read."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(value).date().isoformat()
+    except ValueError:
+        return None
+
+
+def parse_currency(value: Any) -> Optional[str]:
+    """ISO code of the currency written in a price such as '฿1,234.50', 'USD 1,000' or '500 บาท'."""
+    if not isinstance(value, str):
+        return None
+    code = _CURRENCY_CODE.search(value)
+    if code:
+        return code.group(1).upper()
+    for mark, currency in _CURRENCY_MARKS:
+        if mark in value:
+            return currency
+    return None
+
+
+def item_currency(item: Dict[str, Any], default: Optional[str] = None) -> Optional[str]:
+    """Currency of a quoted line item's price, or `default` when the price does not say."""
+    return parse_currency(item.get("unit_price")) or parse_currency(item.get("total_price")) or default
+
+
+def _section(quotation: Dict[str, Any], key: str) -> Dict[str, Any]:
+    """A dict section of an extracted quotation; anything else the extraction returned counts as empty."""
+    value = quotation.get(key)
+    return value if isinstance(value, dict) else {}
+
+
+def _text(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _line_items(quotation: Dict[str, Any]) -> List[Dict[str, Any]]:
+    items = quotation.get("items")
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+
+def quotation_currency(quotation: Dict[str, Any]) -> Optional[str]:
+    """First currency written in a quotation's item prices or totals; applies to prices that omit it."""
+    currencies = [item_currency(item) for item in _line_items(quotation)]
+    currencies += [parse_currency(value) for value in _section(quotation, "totals").values()]
+    return next(filter(None, currencies), None)
+
+
+def normalize_vendor(name: str) -> str:
+    return " ".join(str(name).lower().split())
+
+
+def quotation_digest(quotation: Dict[str, Any]) -> str:
+    """Identifies one extracted quotation, so re-ingesting it is a no-op and analyses can exclude it."""
+    return hashlib.sha256(json.dumps(quotation, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _match_expression(item: str) -> Optional[str]:
+    """
+    FTS5 query requiring every whitespace-separated word of an item description. Each word is
+    a quoted phrase, so FTS5 tokenizes it exactly like the indexed text: a Thai word, which the
+    tokenizer splits at its vowel marks, must then still appear as a whole.
+    """
+    words = list(dict.fromkeys(word.lower() for word in item.split() if _WORD_CHARACTER.search(word)))[:16]
+    if not words:
+        return None
+    return " AND ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+class QuotationIndex:
+    """
+    Persistent index of extracted quotation line items for price-history lookups: SQLite with
+    FTS5 over item descriptions and B-tree indexes on vendor, date and normalised unit price.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("QUOTATION_INDEX_PATH", DEFAULT_INDEX_PATH)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        if "currency" not in {row["name"] for row in conn.execute("PRAGMA table_info(line_item)")}:
+            # Index files created before prices carried a currency
+            try:
+                conn.execute("ALTER TABLE line_item ADD COLUMN currency TEXT")
+            except sqlite3.OperationalError:
+                # Another process migrated the file first
+                pass
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Ingestion ---
+    def ingest(self, quotation: Dict[str, Any], digest: Optional[str] = None) -> bool:
+        """Adds an `/extract-quotation` result; returns False if the same quotation was already indexed."""
+        return self.ingest_many([quotation], [digest] if digest else None) == 1
+
+    def ingest_many(self, quotations: Iterable[Dict[str, Any]], digests: Optional[List[str]] = None) -> int:
+        """Adds several quotations in one transaction; returns how many were new."""
+        conn = self._connect()
+        added = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for position, quotation in enumerate(quotations):
+                digest = digests[position] if digests else quotation_digest(quotation)
+                added += self._insert(conn, quotation, digest)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def _insert(self, conn, quotation, digest) -> int:
+        vendor = str(quotation.get("vendor_name") or _section(quotation, "vendor_info").get("vendor_name") or "Unknown")
+        vendor_norm = normalize_vendor(vendor)
+        details = _section(quotation, "quote_details")
+        quote_date = parse_date(details.get("date"))
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO quotation (digest, vendor, vendor_norm, file_name, quote_number, quote_date, ingested_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (digest, vendor, vendor_norm, _text(quotation.get("file_name")), _text(details.get("quote_number")), quote_date, time.time()),
+        )
+        if cursor.rowcount == 0:
+            return 0
+        quotation_id = cursor.lastrowid
+        default_currency = quotation_currency(quotation)
+        for item in _line_items(quotation):
+            if not item.get("description"):
+                continue
+            quantity = parse_amount(item.get("quantity"))
+            unit_price = parse_amount(item.get("unit_price"))
+            total_price = parse_amount(item.get("total_price"))
+            if unit_price is None and total_price is not None and quantity:
+                unit_price = total_price / quantity
+            currency = item_currency(item, default_currency)
+            description = str(item["description"])
+            line_id = conn.execute(
+                "INSERT INTO line_item (quotation_id, vendor, vendor_norm, quote_date, description, quantity, unit_price, total_price, raw_unit_price, currency) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (quotation_id, vendor, vendor_norm, quote_date, description, quantity, unit_price, total_price,
+                 _text(item.get("unit_price")), currency),
+            ).lastrowid
+            conn.execute("INSERT INTO line_item_fts (rowid, description) VALUES (?, ?)", (line_id, description))
+        return 1
+
+    # --- Queries ---
+    def _matching(self, item, vendor=None, since=None, until=None, currency=None, exclude_digests=None):
+        """
+        FROM/WHERE clause and parameters selecting the priced line items that contain every word
+        of `item`; (None, None) when the description has no searchable words.
+        """
+        expression = _match_expression(item)
+        if expression is None:
+            return None, None
+        filters, params = [], [expression]
+        if vendor:
+            filters.append("li.vendor_norm = ?")
+            params.append(normalize_vendor(vendor))
+        if since:
+            filters.append("li.quote_date >= ?")
+            params.append(since)
+        if until:
+            filters.append("li.quote_date <= ?")
+            params.append(until)
+        if currency:
+            filters.append("li.currency = ?")
+            params.append(currency.upper())
+        if exclude_digests:
+            filters.append(f"li.quotation_id NOT IN (SELECT id FROM quotation WHERE digest IN ({','.join('?' * len(exclude_digests))}))")
+            params.extend(exclude_digests)
+        conditions = "".join(f" AND {condition}" for condition in filters)
+        # CROSS JOIN keeps the full-text match as the outer loop rather than the vendor or date index
+        return (f"FROM line_item_fts CROSS JOIN line_item li ON li.id = line_item_fts.rowid "
+                f"WHERE line_item_fts MATCH ? AND li.unit_price IS NOT NULL{conditions}"), params
+
+    def price_history(self, item: str, vendor: Optional[str] = None, since: Optional[str] = None,
+                      until: Optional[str] = None, currency: Optional[str] = None,
+                      exclude_digests: Optional[List[str]] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recently quoted priced line items matching `item`."""
+        clause, params = self._matching(item, vendor, since, until, currency, exclude_digests)
+        if clause is None:
+            return []
+        rows = self._connect().execute(
+            f"SELECT li.vendor, li.quote_date, li.description, li.quantity, li.unit_price, li.total_price, li.currency "
+            f"{clause} ORDER BY li.quote_date DESC, li.id DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def price_range(self, item: str, vendor: Optional[str] = None, since: Optional[str] = None,
+                    until: Optional[str] = None, currency: Optional[str] = None,
+                    exclude_digests: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Unit price statistics over every line item matching `item`, one range per currency
+        (None for prices without a recognisable currency), most quoted first.
+        """
+        summary = {"item": item, "count": 0, "ranges": []}
+        clause, params = self._matching(item, vendor, since, until, currency, exclude_digests)
+        if clause is None:
+            return summary
+        rows = self._connect().execute(
+            f"SELECT li.currency AS currency, COUNT(*) AS count, MIN(li.unit_price) AS min_unit_price, "
+            f"MAX(li.unit_price) AS max_unit_price, AVG(li.unit_price) AS avg_unit_price, "
+            f"MIN(li.quote_date) AS first_date, MAX(li.quote_date) AS last_date, "
+            f"COUNT(DISTINCT li.vendor_norm) AS vendors {clause} GROUP BY li.currency ORDER BY count DESC",
+            params,
+        ).fetchall()
+        summary["ranges"] = [dict(row) for row in rows]
+        summary["count"] = sum(row["count"] for row in rows)
+        return summary
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> QuotationIndex:
+    """Process-wide index at $QUOTATION_INDEX_PATH."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = QuotationIndex()
+        return _index
@@ -0,0 +1,251 @@
+import heapq
+import itertools
+import re
+import threading
+import time
+import uuid
+from enum import IntEnum
+from typing import Callable, Mapping, Optional
+
+from common.shared_state import SharedStore
+
+
+class Priority(IntEnum):
+    """Scheduling classes for upstream calls. Lower values are served first."""
+    INTERACTIVE = 0  # /chat turns
+    GENERATION = 1   # RFQ / PO generation
+    BULK = 2         # vendor analysis, summaries, document extraction
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parses header durations such as '20ms', '1s', '6m0s' or a bare '30' into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used to reserve tokens-per-minute budget."""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """
+    A token bucket that refills continuously up to `capacity` over one minute. Its level is
+    kept in a plain dict so the limiter can persist it in a shared store.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+
+    def new_state(self, now: float) -> dict:
+        return {"level": self.capacity, "updated": now}
+
+    def _refill(self, state: dict, now: float):
+        state["level"] = min(self.capacity, state["level"] + max(0.0, now - state["updated"]) * self.rate)
+        state["updated"] = now
+
+    def wait_time(self, state: dict, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (requests larger than the bucket wait for a full bucket)."""
+        self._refill(state, now)
+        amount = min(amount, self.capacity)
+        if state["level"] >= amount:
+            return 0.0
+        return (amount - state["level"]) / self.rate
+
+    def take(self, state: dict, amount: float, now: float):
+        self._refill(state, now)
+        state["level"] -= amount
+
+    def give_back(self, state: dict, amount: float, now: float):
+        self._refill(state, now)
+        state["level"] = min(self.capacity, state["level"] + amount)
+
+    def observe_remaining(self, state: dict, remaining: float, now: float):
+        """Lowers the level to what the upstream reports; we never trust it to raise it,
+        since our own in-flight requests may not be counted yet."""
+        self._refill(state, now)
+        state["level"] = min(state["level"], float(remaining))
+
+
+class RateLimiter:
+    """
+    Client-side scheduler for one upstream API.
+
+    Callers block in `acquire()` until both the requests-per-minute and tokens-per-minute
+    buckets allow the call. Waiters are served strictly by priority, FIFO within a class,
+    so an interactive chat turn never queues behind a batch of bulk analyses.
+
+    With a `store`, the bucket levels and Retry-After pauses are shared by every worker
+    and replica using that store. Each process queues its own callers and publishes the
+    priority of its first waiter in the shared state; a waiter defers while another process
+    has a higher-priority one, so a chat turn on one worker goes before bulk calls on another.
+    """
+
+    # How often a waiting caller re-reads shared buckets that other processes may refill or drain
+    SHARED_POLL_INTERVAL = 0.25
+    # A process's published waiter is ignored once it has not polled for this long (e.g. it died)
+    WAITER_TTL = 2.0
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: Optional[float] = None,
+                 store: Optional[SharedStore] = None, clock=time.time):
+        self.name = name
+        self.clock = clock
+        self.store = store
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._state = None
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        # Identifies this limiter's waiters in the shared state
+        self._instance = uuid.uuid4().hex
+
+    # --- Bucket state ---
+    def _new_state(self, now: float) -> dict:
+        state = {"requests": self.requests.new_state(now), "blocked_until": 0.0}
+        if self.tokens is not None:
+            state["tokens"] = self.tokens.new_state(now)
+        return state
+
+    def _mutate(self, func: Callable[[dict, float], object]):
+        """Applies func(state, now) atomically to the (possibly shared) bucket state and returns its result."""
+        if self.store is None:
+            now = self.clock()
+            if self._state is None:
+                self._state = self._new_state(now)
+            return func(self._state, now)
+
+        def apply(state):
+            now = self.clock()
+            state = state or self._new_state(now)
+            return state, func(state, now)
+        return self.store.update(f"ratelimit:{self.name}", apply)
+
+    def _publish_waiter(self, state: dict, now: float, priority: Optional[int]) -> bool:
+        """
+        Records the priority of this process's first waiter (None: no waiters) and drops stale
+        entries of other processes. Returns whether another process has a higher-priority waiter.
+        """
+        waiting = state.setdefault("waiting", {})
+        if priority is None:
+            waiting.pop(self._instance, None)
+        else:
+            waiting[self._instance] = {"priority": priority, "seen": now}
+        for instance, entry in list(waiting.items()):
+            if now - entry["seen"] > self.WAITER_TTL:
+                del waiting[instance]
+        return priority is not None and any(
+            entry["priority"] < priority for instance, entry in waiting.items() if instance != self._instance)
+
+    def _try_take(self, tokens: int, priority: Priority = Priority.BULK) -> float:
+        """Reserves one request and `tokens` if both are available now; otherwise returns the wait."""
+        def try_take(state, now):
+            if self.store is not None and self._publish_waiter(state, now, int(priority)):
+                return self.SHARED_POLL_INTERVAL
+            delay = max(state["blocked_until"] - now, self.requests.wait_time(state["requests"], 1, now))
+            if self.tokens is not None and tokens:
+                delay = max(delay, self.tokens.wait_time(state["tokens"], tokens, now))
+            if delay <= 0:
+                self.requests.take(state["requests"], 1, now)
+                if self.tokens is not None and tokens:
+                    self.tokens.take(state["tokens"], tokens, now)
+            return delay
+        return self._mutate(try_take)
+
+    # --- Public API ---
+    def acquire(self, priority: Priority = Priority.BULK, tokens: int = 0):
+        """Blocks until this caller is first in line and the buckets have room, then reserves them."""
+        ticket = (int(priority), next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self._waiters[0] == ticket:
+                        delay = self._try_take(tokens, priority)
+                        if delay <= 0:
+                            return
+                        if self.store is not None:
+                            delay = min(delay, self.SHARED_POLL_INTERVAL)
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                if self.store is not None:
+                    # Hand the published priority over to the next local waiter, if any
+                    head = self._waiters[0][0] if self._waiters else None
+                    self._mutate(lambda state, now: self._publish_waiter(state, now, head))
+                self._cond.notify_all()
+
+    def reconcile(self, reserved_tokens: int, used_tokens: Optional[int]):
+        """Corrects the token bucket once the actual usage of a call is known."""
+        if self.tokens is None or used_tokens is None:
+            return
+        difference = reserved_tokens - used_tokens
+
+        def settle(state, now):
+            if difference > 0:
+                self.tokens.give_back(state["tokens"], difference, now)
+            elif difference < 0:
+                self.tokens.take(state["tokens"], -difference, now)
+        with self._cond:
+            self._mutate(settle)
+            self._cond.notify_all()
+
+    def back_off(self, seconds: float):
+        """Pauses every caller for `seconds`, e.g. after a 429."""
+        def block(state, now):
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+        with self._cond:
+            self._mutate(block)
+            self._cond.notify_all()
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> Optional[float]:
+        """
+        Syncs the buckets with the upstream's rate-limit headers
+        (x-ratelimit-remaining-requests / -tokens, retry-after, retry-after-ms).
+        Returns the Retry-After delay in seconds when one was given.
+        """
+        remaining_requests = _as_float(headers.get("x-ratelimit-remaining-requests"))
+        remaining_tokens = _as_float(headers.get("x-ratelimit-remaining-tokens"))
+        retry_after = parse_duration(headers.get("retry-after-ms"))
+        if retry_after is not None:
+            retry_after /= 1000.0
+        else:
+            retry_after = parse_duration(headers.get("retry-after"))
+
+        def observe(state, now):
+            if remaining_requests is not None:
+                self.requests.observe_remaining(state["requests"], remaining_requests, now)
+            if remaining_tokens is not None and self.tokens is not None:
+                self.tokens.observe_remaining(state["tokens"], remaining_tokens, now)
+            if retry_after is not None:
+                state["blocked_until"] = max(state["blocked_until"], now + retry_after)
+
+        if remaining_requests is not None or remaining_tokens is not None or retry_after is not None:
+            with self._cond:
+                self._mutate(observe)
+                self._cond.notify_all()
+        return retry_after
+
+
+def _as_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,261 @@
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional, Tuple
+
+
+class SharedStore(ABC):
+    """
+    State shared by every worker and replica of a service: response caches, rate-limiter
+    buckets and single-flight keys. Values must be JSON-serialisable. The push/pop job-queue
+    primitives are not used by any service yet.
+
+    A Redis-compatible backend maps get/set/add/delete/incr to GET, SET EX, SET NX EX, DEL
+    and INCRBY, push/pop to RPUSH/LPOP, and `update` to a WATCH/MULTI transaction.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Sets `key` only if it is absent; returns whether it was set."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        ...
+
+    @abstractmethod
+    def update(self, key: str, func: Callable[[Any], Tuple[Any, Any]], ttl: Optional[float] = None) -> Any:
+        """Atomically replaces the value with func(old)[0] and returns func(old)[1]."""
+
+    @abstractmethod
+    def push(self, queue: str, item: Any):
+        ...
+
+    @abstractmethod
+    def pop(self, queue: str) -> Any:
+        """Removes and returns the oldest item of `queue`, or None when it is empty."""
+
+
+class MemoryStore(SharedStore):
+    """In-process store; only shared between the threads of a single worker."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._values = {}
+        self._queues = {}
+
+    def _live(self, key):
+        entry = self._values.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del self._values[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            if self._live(key):
+                return False
+            self.set(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        return self.update(key, lambda value: ((value or 0) + amount,) * 2, ttl)
+
+    def update(self, key, func, ttl=None):
+        with self._lock:
+            new_value, result = func(self.get(key))
+            self.set(key, new_value, ttl)
+            return result
+
+    def push(self, queue, item):
+        with self._lock:
+            self._queues.setdefault(queue, []).append(item)
+
+    def pop(self, queue):
+        with self._lock:
+            items = self._queues.get(queue)
+            return items.pop(0) if items else None
+
+
+class SQLiteStore(SharedStore):
+    """
+    Store backed by one SQLite file in WAL mode. Every worker process and every replica
+    that mounts the same file sees the same state; on /dev/shm it never touches disk.
+    """
+
+    # Expired keys are purged on every Nth `set` of a process
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._sets = itertools.count(1)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS queue (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, item TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_queue_name ON queue (name, id)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        conn = self._connect()
+        # IMMEDIATE takes the write lock up front so read-modify-write cycles cannot interleave
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def _read(self, conn, key):
+        row = conn.execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[0])
+
+    def _write(self, conn, key, value, ttl):
+        conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                     (key, json.dumps(value), time.time() + ttl if ttl else None))
+
+    def _run(self, func):
+        conn = self._transaction()
+        try:
+            result = func(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, key):
+        return self._read(self._connect(), key)
+
+    def set(self, key, value, ttl=None):
+        conn = self._connect()
+        self._write(conn, key, value, ttl)
+        if next(self._sets) % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+
+    def add(self, key, value, ttl=None):
+        def add_if_absent(conn):
+            if self._read(conn, key) is not None:
+                return False
+            self._write(conn, key, value, ttl)
+            return True
+        return self._run(add_if_absent)
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def incr(self, key, amount=1, ttl=None):
+        return self.update(key, lambda value: ((value or 0) + amount,) * 2, ttl)
+
+    def update(self, key, func, ttl=None):
+        def read_modify_write(conn):
+            new_value, result = func(self._read(conn, key))
+            self._write(conn, key, new_value, ttl)
+            return result
+        return self._run(read_modify_write)
+
+    def push(self, queue, item):
+        self._connect().execute("INSERT INTO queue (name, item) VALUES (?, ?)", (queue, json.dumps(item)))
+
+    def pop(self, queue):
+        def pop_oldest(conn):
+            row = conn.execute("SELECT id, item FROM queue WHERE name = ? ORDER BY id LIMIT 1", (queue,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM queue WHERE id = ?", (row[0],))
+            return json.loads(row[1])
+        return self._run(pop_oldest)
+
+
+# URL scheme -> factory(rest_of_url); register other backends (e.g. a Redis client) here
+STORE_BACKENDS = {
+    "memory": lambda location: MemoryStore(),
+    "sqlite": lambda location: SQLiteStore(location),
+}
+
+_SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+DEFAULT_SHARED_STATE_URL = f"sqlite:///{os.path.join(_SHM_DIR, 'procurement-state.db')}"
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(url: Optional[str] = None) -> SharedStore:
+    """
+    Returns the process-wide store for `url` (default: $SHARED_STATE_URL), e.g.
+    'sqlite:////var/lib/procurement/state.db' or 'memory://'.
+    """
+    url = url or os.getenv("SHARED_STATE_URL", DEFAULT_SHARED_STATE_URL)
+    with _stores_lock:
+        if url not in _stores:
+            scheme, _, location = url.partition("://")
+            if scheme not in STORE_BACKENDS:
+                raise ValueError(f"Unsupported shared state backend: {scheme}")
+            if scheme == "sqlite":
+                # sqlite:///relative.db and sqlite:////absolute.db, as in SQLAlchemy URLs
+                location = location[1:] if location.startswith("/") else location
+            _stores[url] = STORE_BACKENDS[scheme](location)
+        return _stores[url]
+
+
+def get_or_compute(store: SharedStore, key: str, compute: Callable[[], Any], ttl: float,
+                   wait_timeout: float = 30.0, poll_interval: float = 0.05) -> Any:
+    """
+    Cached `compute()` with single-flight: across all workers only one caller computes a
+    missing key while the others wait for its result (or compute it themselves on timeout).
+    """
+    value = store.get(key)
+    if value is not None:
+        return value
+    inflight_key = f"{key}:inflight"
+    deadline = time.time() + wait_timeout
+    while not store.add(inflight_key, True, ttl=wait_timeout):
+        time.sleep(poll_interval)
+        value = store.get(key)
+        if value is not None:
+            return value
+        if time.time() >= deadline:
+            return compute()
+    try:
+        value = store.get(key)
+        if value is None:
+            value = compute()
+            store.set(key, value, ttl)
+        return value
+    finally:
+        store.delete(inflight_key)
@@ -0,0 +1,299 @@
+import contextvars
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Fraction of new traces that are recorded; a sampled caller's decision is always followed
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+# JSON Lines file spans are appended to; empty disables export
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", os.path.join(tempfile.gettempdir(), "procurement-traces.jsonl"))
+# The export file is rotated to `<path>.1` once it grows past this size
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trace_context", default=None)
+_service: contextvars.ContextVar = contextvars.ContextVar("trace_service", default=os.getenv("TRACE_SERVICE_NAME", "unknown"))
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+# --- W3C Trace Context propagation ---
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parses a `traceparent` header ('00-<trace id>-<parent span id>-<flags>')."""
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2], bool(flags & 1))
+
+
+def format_traceparent(context: SpanContext) -> str:
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+def inject(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Returns `headers` plus the `traceparent` of the current span, if any."""
+    headers = dict(headers or {})
+    context = _current.get()
+    if context is not None:
+        headers["traceparent"] = format_traceparent(context)
+    return headers
+
+
+def current_trace_id() -> Optional[str]:
+    """Id of the current trace if it is being recorded."""
+    context = _current.get()
+    return context.trace_id if context and context.sampled else None
+
+
+# --- Export ---
+class FileExporter:
+    """
+    Appends spans as JSON lines. Each span is a single O_APPEND write, so every worker and
+    service can share one file; a collector can tail it.
+
+    Any process may rotate the file. Every process periodically checks, under a lock file,
+    whether its descriptor still refers to the file at `path` and reopens it if another
+    process rotated it, so no process keeps appending to the rotated or a deleted file.
+    """
+
+    # Every Nth span of a process checks for rotation
+    ROTATE_CHECK_EVERY = 200
+
+    def __init__(self, path: str, max_bytes: int = TRACE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._fd = None
+        self._written = 0
+
+    def export(self, span: Dict[str, Any]):
+        line = (json.dumps(span, ensure_ascii=False, default=str) + "\n").encode()
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.write(self._fd, line)
+            self._written += 1
+            if self._written % self.ROTATE_CHECK_EVERY == 0:
+                self._check_rotation()
+
+    def _check_rotation(self):
+        lock_fd = os.open(self.path + ".lock", os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                current = os.stat(self.path)
+            except FileNotFoundError:
+                current = None
+            if current is None or current.st_ino != os.fstat(self._fd).st_ino:
+                # Rotated or removed by another process
+                os.close(self._fd)
+                self._fd = None
+            elif current.st_size > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+                os.close(self._fd)
+                self._fd = None
+        finally:
+            # Closing the descriptor releases the lock
+            os.close(lock_fd)
+
+
+_exporter = FileExporter(TRACE_EXPORT_PATH) if TRACE_EXPORT_PATH else None
+
+
+def set_exporter(exporter):
+    """Replaces the span exporter: any object with `export(span_dict)`, or None to drop spans."""
+    global _exporter
+    _exporter = exporter
+
+
+def load_trace(trace_id: str, path: Optional[str] = None, max_bytes: int = 8 * 1024 * 1024) -> List[Dict[str, Any]]:
+    """Spans of one trace from the tail of the export file (and its rotated predecessor), by start time."""
+    path = path or TRACE_EXPORT_PATH
+    needle = f'"trace_id": "{trace_id}"'
+    spans = []
+    for candidate in (path + ".1", path):
+        try:
+            with open(candidate, "rb") as f:
+                f.seek(max(0, os.fstat(f.fileno()).st_size - max_bytes))
+                for line in f:
+                    text = line.decode("utf-8", errors="replace")
+                    if needle in text:
+                        try:
+                            spans.append(json.loads(text))
+                        except ValueError:
+                            continue
+        except FileNotFoundError:
+            continue
+    return sorted(spans, key=lambda span: span["start"])
+
+
+# --- Spans ---
+class Span:
+    __slots__ = ("name", "context", "parent_id", "service", "attributes", "start", "_started", "_ended")
+
+    def __init__(self, name, context, parent_id, service, attributes):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.service = service
+        self.attributes = attributes
+        self.start, self._started = time.time(), time.perf_counter()
+        self._ended = False
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None):
+        """Records the span; `error` marks it failed. Only the first call counts."""
+        if self._ended:
+            return
+        self._ended = True
+        duration_ms = (time.perf_counter() - self._started) * 1000
+        if _exporter is None:
+            return
+        record = {
+            "trace_id": self.context.trace_id, "span_id": self.context.span_id, "parent_id": self.parent_id,
+            "name": self.name, "service": self.service, "start": self.start, "duration_ms": round(duration_ms, 3),
+            "status": "error" if error or self.attributes.get("http.status_code", 0) >= 500 else "ok",
+            "attributes": self.attributes,
+        }
+        if error:
+            record["error"] = f"{type(error).__name__}: {error}"
+        try:
+            _exporter.export(record)
+        except OSError:
+            # Tracing must never break the traced request
+            pass
+
+
+class _NonRecordingSpan:
+    """Returned for unsampled traces so instrumented code pays almost nothing."""
+    __slots__ = ("context", "service")
+
+    def __init__(self, context: Optional[SpanContext] = None, service: Optional[str] = None):
+        self.context = context
+        self.service = service
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def end(self, error: Optional[BaseException] = None):
+        pass
+
+
+_NON_RECORDING = _NonRecordingSpan()
+
+
+def start_span(name: str, service: Optional[str] = None, parent: Optional[SpanContext] = None,
+               sample: Optional[bool] = None, **attributes):
+    """
+    Starts a span that outlives a block, e.g. one ended by a streaming generator. The caller
+    must call `end()`, and `use_span()` to make it the parent of spans started meanwhile.
+    Parenting and sampling follow `span()`.
+    """
+    parent = parent or _current.get()
+    if parent is not None and not parent.sampled and service is None:
+        return _NON_RECORDING
+    if parent is None:
+        sampled = sample if sample is not None else random.random() < TRACE_SAMPLE_RATE
+        context = SpanContext(_new_id(128), _new_id(64), sampled)
+    else:
+        context = SpanContext(parent.trace_id, _new_id(64), parent.sampled)
+    if not context.sampled:
+        return _NonRecordingSpan(context, service)
+    return Span(name, context, parent.span_id if parent else None, service or _service.get(), attributes)
+
+
+@contextmanager
+def use_span(current):
+    """Makes `current` the parent of spans started in the enclosed block, without ending it."""
+    context_token = _current.set(current.context) if current.context is not None else None
+    service_token = _service.set(current.service) if current.service else None
+    try:
+        yield current
+    finally:
+        if context_token is not None:
+            _current.reset(context_token)
+        if service_token is not None:
+            _service.reset(service_token)
+
+
+@contextmanager
+def span(name: str, service: Optional[str] = None, parent: Optional[SpanContext] = None,
+         sample: Optional[bool] = None, **attributes):
+    """
+    Times the enclosed block as a child of the current span (or of `parent`). Without a
+    parent a new trace starts, recorded with probability TRACE_SAMPLE_RATE unless `sample`
+    decides. `service` names the service for this span and everything below it.
+    """
+    current = start_span(name, service=service, parent=parent, sample=sample, **attributes)
+    error = None
+    try:
+        with use_span(current):
+            yield current
+    except Exception as e:
+        # BaseExceptions such as Streamlit's rerun signal are control flow, not failures
+        error = e
+        raise
+    finally:
+        current.end(error)
+
+
+# --- FastAPI / ASGI ---
+class TracingMiddleware:
+    """
+    ASGI middleware that continues the caller's trace from its `traceparent` header, records
+    one server span per request (ending when the response body is complete, so streamed
+    responses are timed in full) and returns the `traceparent` to the caller.
+
+        app.add_middleware(TracingMiddleware, service="pdf-service")
+    """
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        parent = None
+        for key, value in scope.get("headers") or []:
+            if key == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+        with span(f"{scope['method']} {scope['path']}", service=self.service, parent=parent,
+                  **{"http.method": scope["method"], "http.route": scope["path"]}) as server_span:
+            traceparent = format_traceparent(_current.get()).encode()
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    server_span.set_attribute("http.status_code", message["status"])
+                    message = dict(message, headers=list(message.get("headers") or []) + [(b"traceparent", traceparent)])
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
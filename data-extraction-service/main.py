@@ -1,18 +1,42 @@
 import os
 import json
+import logging
 import requests
 import tempfile
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from typing import Optional
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query
+from fastapi.concurrency import run_in_threadpool
+
+from common.quotation_index import get_index
+from common.rate_limiter import Priority, RateLimiter
+from common.shared_state import get_store
+from common.tracing import TracingMiddleware, span
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Data Extraction Service",
     description="Extracts structured data from documents using AgentQL.",
 )
+app.add_middleware(TracingMiddleware, service="data-extraction-service")
 
 AGENTQL_API_KEY = os.getenv("AGENTQL_API_KEY")
 if not AGENTQL_API_KEY:
     raise RuntimeError("AGENTQL_API_KEY environment variable is not set.")
 
+AGENTQL_RPM_LIMIT = float(os.getenv("AGENTQL_RPM_LIMIT", "10"))
+AGENTQL_MAX_ATTEMPTS = int(os.getenv("AGENTQL_MAX_ATTEMPTS", "3"))
+
+agentql_limiter = RateLimiter("agentql", AGENTQL_RPM_LIMIT, store=get_store())
+quotation_index = get_index()
+
+def _index_quotation(extracted_data):
+    """Adds an extraction to the price-history index; indexing problems never fail an extraction."""
+    try:
+        quotation_index.ingest(extracted_data)
+    except Exception:
+        logger.exception("Could not index quotation %s", extracted_data.get("file_name"))
+
 @app.post("/extract-quotation", summary="Extract Data from a Quotation File")
 async def extract_quotation_data(
     vendor_name: str = Form(...),
@@ -40,13 +64,24 @@ async def extract_quotation_data(
             "params": {"mode": "standard"}
         }
 
-        with open(tmp_path, 'rb') as f:
-            files_to_send = {
-                'file': (file.filename, f, file.content_type),
-                'body': (None, json.dumps(query_body))
-            }
-            response = requests.post(url, headers=headers, files=files_to_send, timeout=120)
-        
+        for attempt in range(AGENTQL_MAX_ATTEMPTS):
+            # Waiting for a slot must not block the event loop
+            with span("rate_limiter.acquire", limiter="agentql", priority=Priority.BULK.name, attempt=attempt):
+                await run_in_threadpool(agentql_limiter.acquire, Priority.BULK)
+            with open(tmp_path, 'rb') as f:
+                files_to_send = {
+                    'file': (file.filename, f, file.content_type),
+                    'body': (None, json.dumps(query_body))
+                }
+                with span("agentql.query_document", attempt=attempt, file_bytes=len(content)) as agentql_span:
+                    response = requests.post(url, headers=headers, files=files_to_send, timeout=120)
+                    agentql_span.set_attribute("http.status_code", response.status_code)
+            retry_after = agentql_limiter.update_from_headers(response.headers)
+            if response.status_code != 429:
+                break
+            if retry_after is None:
+                agentql_limiter.back_off(2 ** attempt)
+
         os.unlink(tmp_path) # Clean up the temp file
 
         if response.status_code == 200:
@@ -55,6 +90,8 @@ async def extract_quotation_data(
                 extracted_data = result['data']
                 extracted_data['vendor_name'] = vendor_name
                 extracted_data['file_name'] = file.filename
+                with span("quotation_index.ingest"):
+                    await run_in_threadpool(_index_quotation, extracted_data)
                 return extracted_data
             else:
                 raise HTTPException(status_code=422, detail=f"API success, but no data extracted. Response: {response.text}")
@@ -62,4 +99,26 @@ async def extract_quotation_data(
             raise HTTPException(status_code=response.status_code, detail=f"AgentQL API Error: {response.text}")
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred during extraction: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred during extraction: {str(e)}")
+
+@app.get("/price-history", summary="Historical Prices for an Item")
+def price_history(
+    item: str = Query(..., min_length=1, description="Item description to match"),
+    vendor: Optional[str] = None,
+    since: Optional[str] = Query(None, description="Earliest quote date (YYYY-MM-DD)"),
+    until: Optional[str] = Query(None, description="Latest quote date (YYYY-MM-DD)"),
+    currency: Optional[str] = Query(None, description="ISO currency code, e.g. THB"),
+    limit: int = Query(20, ge=1, le=500),
+):
+    return {"item": item, "rows": quotation_index.price_history(item, vendor=vendor, since=since, until=until,
+                                                                 currency=currency, limit=limit)}
+
+@app.get("/price-range", summary="Historical Price Range for an Item")
+def price_range(
+    item: str = Query(..., min_length=1, description="Item description to match"),
+    vendor: Optional[str] = None,
+    since: Optional[str] = Query(None, description="Earliest quote date (YYYY-MM-DD)"),
+    until: Optional[str] = Query(None, description="Latest quote date (YYYY-MM-DD)"),
+    currency: Optional[str] = Query(None, description="ISO currency code, e.g. THB"),
+):
+    return quotation_index.price_range(item, vendor=vendor, since=since, until=until, currency=currency)
@@ -5,6 +5,7 @@ from datetime import datetime
 # Import from our refactored modules
 import config
 import ui_components
+from common import tracing
 
 # --- PAGE SETUP ---
 st.set_page_config(**config.PAGE_CONFIG)
@@ -32,7 +33,13 @@ def initialize_session_state():
 def main():
     """Main function to run the Streamlit app."""
     initialize_session_state()
+    # Each rerun is the root of a trace that follows every API call into the services
+    with tracing.span("streamlit.rerun", service="frontend-service",
+                      sample=True if st.session_state.get(config.S_TRACE_SESSION) else None):
+        render_app()
 
+def render_app():
+    """Renders the page and the current workflow step."""
     st.title("🤖 Advanced AI-Powered Procurement Assistant")
     st.markdown("Complete procurement workflow from RFQ generation to purchase order creation.")
     
@@ -61,6 +68,8 @@ def main():
     elif step == 5:
         ui_components.render_step_5_export()
 
+    ui_components.render_latency_waterfall()
+
     # --- FOOTER ---
     st.markdown("---")
     st.markdown("🚀 **AI-Powered Procurement Assistant** - Streamlining procurement workflows with AI")
@@ -10,6 +10,19 @@ load_dotenv()
 AGENTQL_API_KEY = st.secrets.get("AGENTQL_API_KEY", os.getenv("AGENTQL_API_KEY"))
 OPENAI_API_KEY = st.secrets.get("OPENAI_API_KEY", os.getenv("OPENAI_API_KEY"))
 
+# --- SERVICE ENDPOINTS ---
+# "http" calls the service containers; "inprocess" calls the service apps directly (see monolith.py)
+SERVICE_MODE = os.getenv("SERVICE_MODE", "http")
+# Defaults are based on the service names in docker-compose
+PROCUREMENT_SERVICE_URL = os.getenv("PROCUREMENT_SERVICE_URL", "http://procurement-service:8000")
+DATA_EXTRACTION_URL = os.getenv("DATA_EXTRACTION_URL", "http://data-extraction-service:8001")
+PDF_SERVICE_URL = os.getenv("PDF_SERVICE_URL", "http://pdf-service:8002")
+SERVICE_URLS = {
+    "procurement-service": PROCUREMENT_SERVICE_URL,
+    "data-extraction-service": DATA_EXTRACTION_URL,
+    "pdf-service": PDF_SERVICE_URL
+}
+
 # --- PAGE CONFIGURATION ---
 PAGE_CONFIG = {
     "layout": "wide",
@@ -47,4 +60,10 @@ S_VENDOR_RECOMMENDATION = 'vendor_recommendation'
 S_PURCHASE_ORDER = 'purchase_order'
 S_CHAT_HISTORY = 'chat_history'
 S_COMPANY_CONFIG = 'company_config'
-S_CHAT_MESSAGES = 'chat_messages'
\ No newline at end of file
+S_CHAT_MESSAGES = 'chat_messages'
+S_TRACES = 'traces'
+S_TRACE_SESSION = 'trace_session'
+
+# --- TRACING ---
+# Recent traces kept per workflow step for the latency waterfall
+MAX_TRACES_PER_STEP = 5
\ No newline at end of file
@@ -1,17 +1,21 @@
 import requests
 import streamlit as st
 import json
+import threading
 import pandas as pd
+from collections import OrderedDict
 from datetime import datetime
+from urllib.parse import urlparse
 
 # Import from our other project modules
 import config
+from common import tracing
 
 # --- API Service URLs ---
-# These URLs are based on the service names in docker-compose
-PROCUREMENT_SERVICE_URL = "http://procurement-service:8000"
-DATA_EXTRACTION_URL = "http://data-extraction-service:8001"
-PDF_SERVICE_URL = "http://pdf-service:8002"
+# Configured through environment variables in config.py
+PROCUREMENT_SERVICE_URL = config.PROCUREMENT_SERVICE_URL
+DATA_EXTRACTION_URL = config.DATA_EXTRACTION_URL
+PDF_SERVICE_URL = config.PDF_SERVICE_URL
 
 def send_to_webhook(data, webhook_url):
     """Send data to a specified webhook endpoint."""
@@ -29,17 +33,92 @@ def send_to_webhook(data, webhook_url):
     except requests.exceptions.RequestException as e:
         return {"success": False, "error": f"Failed to send data: {str(e)}"}
     
-# --- Helper function to handle API calls ---
+# --- Helper functions to handle API calls ---
+def _in_process_request(method, url, **kwargs):
+    """Monolith mode: maps the service URL to its app and calls the endpoint directly."""
+    import monolith
+    for service, base_url in config.SERVICE_URLS.items():
+        if url.startswith(base_url):
+            return monolith.dispatch(service, method, url[len(base_url):], **kwargs)
+    raise ValueError(f"No service is configured for {url}")
+
+def _client_span(method, url):
+    """Span for one API call; the call's trace is listed in the waterfall of the current step."""
+    trace_id = tracing.current_trace_id()
+    if trace_id:
+        traces = st.session_state.setdefault(config.S_TRACES, {}).setdefault(st.session_state[config.S_WORKFLOW_STEP], [])
+        if not any(recorded == trace_id for _, recorded in traces):
+            traces.append((datetime.now().timestamp(), trace_id))
+            del traces[:-config.MAX_TRACES_PER_STEP]
+    path = urlparse(url).path or "/"
+    return tracing.span(f"{method.upper()} {path}", **{"http.method": method.upper(), "http.url": url})
+
 def handle_api_request(method, url, **kwargs):
-    try:
-        response = requests.request(method, url, **kwargs)
-        response.raise_for_status()
-        if 'application/json' in response.headers.get('Content-Type', ''):
-            return response.json()
-        return response.content
-    except requests.exceptions.RequestException as e:
-        st.error(f"API Request Failed: {e.response.text if e.response else str(e)}")
+    with _client_span(method, url) as client_span:
+        if config.SERVICE_MODE == "inprocess":
+            try:
+                return _in_process_request(method, url, **kwargs)
+            except Exception as e:
+                st.error(f"API Request Failed: {str(e)}")
+                return None
+        try:
+            response = requests.request(method, url, headers=tracing.inject(kwargs.pop("headers", None)), **kwargs)
+            client_span.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+            if 'application/json' in response.headers.get('Content-Type', ''):
+                return response.json()
+            return response.content
+        except requests.exceptions.RequestException as e:
+            st.error(f"API Request Failed: {e.response.text if e.response else str(e)}")
+            return None
+
+def stream_api_request(method, url, **kwargs):
+    """Yields the NDJSON events of a streaming endpoint as they arrive."""
+    with _client_span(method, url) as client_span:
+        if config.SERVICE_MODE == "inprocess":
+            try:
+                for chunk in _in_process_request(method, url, stream=True, **kwargs):
+                    for line in chunk.splitlines():
+                        if line:
+                            yield json.loads(line)
+            except Exception as e:
+                st.error(f"API Request Failed: {str(e)}")
+            return
+        try:
+            with requests.request(method, url, stream=True, headers=tracing.inject(kwargs.pop("headers", None)), **kwargs) as response:
+                client_span.set_attribute("http.status_code", response.status_code)
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        yield json.loads(line)
+        except requests.exceptions.RequestException as e:
+            st.error(f"API Request Failed: {e.response.text if e.response else str(e)}")
+
+def generate_document_streaming(url, payload):
+    """
+    Streams a generated JSON document, previewing each section as soon as it completes.
+    Returns the document as JSON text, or None if the generation failed part-way.
+    """
+    preview = st.empty()
+    sections = {}
+    content = None
+    failed = False
+    for event in stream_api_request("POST", url, json=payload):
+        if event["event"] == "section":
+            sections[event["key"]] = event["value"]
+            preview.json(sections)
+        elif event["event"] == "error":
+            st.error(event["detail"])
+            failed = True
+        elif event["event"] == "done":
+            content = event["content"]
+    preview.empty()
+    # The `done` event after an error only carries a truncated document
+    if failed or content is None:
         return None
+    # The sections were repaired by the service; the raw content may hold fences or a truncated tail.
+    # Output without a JSON object is kept as it is.
+    return json.dumps(sections, ensure_ascii=False) if sections else content
 
 # --- UI Rendering Functions (No changes to display_company_header, display_api_status, render_sidebar) ---
 def display_company_header():
@@ -102,6 +181,8 @@ def render_sidebar():
         )
 
     st.sidebar.markdown("---")
+    st.sidebar.checkbox("⏱️ Trace this session", key=config.S_TRACE_SESSION,
+                        help="Record every step for the latency waterfall instead of a sample.")
     if st.sidebar.button("🔄 Start New Procurement", use_container_width=True):
         # Clear all session state data
         keys_to_clear = [
@@ -154,11 +235,11 @@ def render_step_1_rfq():
                         "user_requirements": requirements_text,
                         "company_config": st.session_state[config.S_COMPANY_CONFIG]
                     }
-                    response_data = handle_api_request("POST", f"{PROCUREMENT_SERVICE_URL}/generate-rfq", json=payload)
-                    if response_data:
+                    content = generate_document_streaming(f"{PROCUREMENT_SERVICE_URL}/generate-rfq/stream", payload)
+                    if content is not None:
                         st.session_state[config.S_RFQ_DATA] = {
                             "requirements": requirements_text,
-                            "content": response_data.get("content"),
+                            "content": content,
                             "generated_at": datetime.now().isoformat()
                         }
                         st.success("RFQ Generated!")
@@ -251,11 +332,11 @@ def render_step_4_purchase_order():
                 "recommendation_data": st.session_state[config.S_VENDOR_RECOMMENDATION],
                 "company_config": st.session_state[config.S_COMPANY_CONFIG]
             }
-            po_data = handle_api_request("POST", f"{PROCUREMENT_SERVICE_URL}/generate-po", json=payload)
-            if po_data:
+            content = generate_document_streaming(f"{PROCUREMENT_SERVICE_URL}/generate-po/stream", payload)
+            if content is not None:
                 st.session_state[config.S_PURCHASE_ORDER] = {
                     "vendor": selected_vendor,
-                    "content": po_data.get('content'),
+                    "content": content,
                     "generated_at": datetime.now().isoformat()
                 }
                 st.success("Purchase Order generated!")
@@ -328,4 +409,84 @@ def render_step_5_export():
                     else:
                         st.error(f"❌ Webhook test failed: {result['error']}")
             else:
-                st.warning("Please enter a webhook URL to test.")
\ No newline at end of file
+                st.warning("Please enter a webhook URL to test.")
+
+# --- LATENCY WATERFALL ---
+def _waterfall_rows(spans):
+    """Orders spans depth-first under their parents, with start/end offsets from the trace start."""
+    children = {}
+    span_ids = {span["span_id"] for span in spans}
+    for span in spans:
+        parent = span["parent_id"] if span["parent_id"] in span_ids else None
+        children.setdefault(parent, []).append(span)
+    trace_start = min(span["start"] for span in spans)
+    rows = []
+
+    def visit(parent, depth):
+        for span in sorted(children.get(parent, []), key=lambda s: s["start"]):
+            offset_ms = (span["start"] - trace_start) * 1000
+            rows.append({
+                "span": f"{len(rows) + 1:02d} {'· ' * depth}{span['name']}",
+                "service": span["service"],
+                "start_ms": round(offset_ms, 1),
+                "end_ms": round(offset_ms + span["duration_ms"], 1),
+                "duration_ms": round(span["duration_ms"], 1),
+                "status": span["status"],
+            })
+            visit(span["span_id"], depth + 1)
+    visit(None, 0)
+    return rows
+
+# Finished traces kept in memory; an unfinished one is read from the export file again
+TRACE_CACHE_SIZE = 64
+_trace_cache_lock = threading.Lock()
+
+@st.cache_resource
+def _finished_traces():
+    """Spans of finished traces by trace id, shared by all sessions."""
+    return OrderedDict()
+
+def _load_trace(trace_id):
+    cache = _finished_traces()
+    with _trace_cache_lock:
+        spans = cache.get(trace_id)
+    if spans is not None:
+        return spans
+    spans = tracing.load_trace(trace_id)
+    # The root span is exported last, when the run has ended
+    if any(span["parent_id"] is None for span in spans):
+        with _trace_cache_lock:
+            cache[trace_id] = spans
+            while len(cache) > TRACE_CACHE_SIZE:
+                cache.popitem(last=False)
+    return spans
+
+def render_latency_waterfall():
+    """Shows where the time of this step's recent traced runs was spent, across all services."""
+    traces = st.session_state.get(config.S_TRACES, {}).get(st.session_state[config.S_WORKFLOW_STEP])
+    if not traces:
+        return
+    with st.expander("⏱️ Latency Waterfall"):
+        options = {f"{datetime.fromtimestamp(recorded_at):%H:%M:%S} · {trace_id[:8]}": trace_id
+                   for recorded_at, trace_id in reversed(traces)}
+        choice = st.selectbox("Traced run", list(options))
+        # The expander body runs on every rerun even when collapsed, so the trace is only read on request
+        if not st.toggle("Show waterfall", key="show_latency_waterfall"):
+            return
+        spans = _load_trace(options[choice])
+        if not spans:
+            st.info("No spans have been exported for this run yet.")
+            return
+        df = pd.DataFrame(_waterfall_rows(spans))
+        st.vega_lite_chart(df, {
+            "mark": {"type": "bar", "cornerRadius": 2},
+            "encoding": {
+                "y": {"field": "span", "type": "nominal", "sort": None, "title": None},
+                "x": {"field": "start_ms", "type": "quantitative", "title": "ms since start"},
+                "x2": {"field": "end_ms"},
+                "color": {"field": "service", "type": "nominal"},
+                "tooltip": [{"field": "span"}, {"field": "service"}, {"field": "duration_ms", "title": "duration (ms)"},
+                            {"field": "status"}],
+            },
+        }, use_container_width=True)
+        st.dataframe(df, hide_index=True, use_container_width=True)
@@ -0,0 +1,153 @@
+"""
+Monolith mode: runs procurement-service, data-extraction-service and pdf-service in one process.
+
+- `app` mounts the three FastAPI apps under one ASGI server (`uvicorn monolith:app`).
+- `dispatch()` calls an endpoint function directly, which the frontend uses when
+  SERVICE_MODE=inprocess, skipping both the HTTP hop and the JSON round trip.
+"""
+import asyncio
+import functools
+import importlib.util
+import inspect
+import io
+import os
+import sys
+from typing import Annotated, Any
+from urllib.parse import parse_qsl
+
+from fastapi import FastAPI, HTTPException, UploadFile
+from fastapi import params as fastapi_params
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from pydantic.fields import FieldInfo
+from starlette.datastructures import Headers
+from starlette.routing import Route
+
+from common.tracing import span
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Service directory -> mount path in the combined ASGI app
+SERVICES = {
+    "procurement-service": "/procurement",
+    "data-extraction-service": "/data-extraction",
+    "pdf-service": "/pdf",
+}
+
+
+class ServiceError(Exception):
+    """An endpoint failed the way it would have answered with an HTTP error status."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(f"{status_code} Error: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+@functools.lru_cache(maxsize=None)
+def load_service(name):
+    """Imports `<name>/main.py` under a unique module name and returns its FastAPI app."""
+    service_dir = os.path.join(ROOT, name)
+    if service_dir not in sys.path:
+        # Sibling modules such as prompts.py are imported by their bare name
+        sys.path.append(service_dir)
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_") + "_main", os.path.join(service_dir, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def _resolve_endpoint(app, method, path):
+    for route in app.routes:
+        if isinstance(route, Route) and route.path == path and method.upper() in route.methods:
+            return route.endpoint
+    raise ServiceError(404, "Not Found")
+
+
+def _bind_query_parameter(name, parameter, query):
+    """Validates one query (or plain) parameter like FastAPI, including Query() constraints and defaults."""
+    field = parameter.default if isinstance(parameter.default, FieldInfo) else None
+    key = field.alias if field is not None and field.alias else name
+    if key in query:
+        annotation = Any if parameter.annotation is inspect.Parameter.empty else parameter.annotation
+        return TypeAdapter(Annotated[annotation, field] if field is not None else annotation).validate_python(query[key])
+    if field is not None:
+        if field.is_required():
+            raise KeyError(key)
+        return field.get_default(call_default_factory=True)
+    if parameter.default is inspect.Parameter.empty:
+        raise KeyError(key)
+    return parameter.default
+
+
+def _bind_arguments(endpoint, json=None, data=None, files=None, query=None):
+    """Builds endpoint arguments the way FastAPI would from a JSON body or multipart form and query parameters."""
+    data, files, query = data or {}, files or {}, query or {}
+    arguments = {}
+    try:
+        for name, parameter in inspect.signature(endpoint).parameters.items():
+            if inspect.isclass(parameter.annotation) and issubclass(parameter.annotation, BaseModel):
+                arguments[name] = parameter.annotation.model_validate(json)
+            elif isinstance(parameter.default, fastapi_params.File):
+                filename, content, content_type = files[name]
+                arguments[name] = UploadFile(io.BytesIO(content), size=len(content), filename=filename,
+                                             headers=Headers({"content-type": content_type or ""}))
+            elif isinstance(parameter.default, fastapi_params.Form):
+                arguments[name] = data[name]
+            else:
+                arguments[name] = _bind_query_parameter(name, parameter, query)
+    except ValidationError as e:
+        raise ServiceError(422, e.errors())
+    except KeyError as e:
+        raise ServiceError(422, f"Field required: {e.args[0]}")
+    return arguments
+
+
+def _iter_body(response):
+    """Drains a StreamingResponse body from synchronous code."""
+    loop = asyncio.new_event_loop()
+    try:
+        iterator = response.body_iterator.__aiter__()
+        while True:
+            try:
+                chunk = loop.run_until_complete(iterator.__anext__())
+            except StopAsyncIteration:
+                break
+            yield chunk if isinstance(chunk, bytes) else chunk.encode(response.charset)
+    finally:
+        loop.close()
+
+
+def dispatch(service, method, path, json=None, data=None, files=None, params=None, stream=False, **kwargs):
+    """
+    Calls an endpoint of `service` in-process. Returns the endpoint's JSON payload, the bytes
+    of a streamed response, or an iterator of its chunks when `stream=True`. Other `requests`
+    keyword arguments (timeout, headers) are accepted and ignored.
+    """
+    path, _, query_string = path.partition("?")
+    query = dict(parse_qsl(query_string))
+    query.update(params or {})
+    endpoint = _resolve_endpoint(load_service(service), method, path)
+    arguments = _bind_arguments(endpoint, json, data, files, query)
+    # Stands in for the services' HTTP server spans; a streamed body is drained after it ends
+    with span(f"{method.upper()} {path}", service=service, **{"http.method": method.upper(), "http.route": path}) as server_span:
+        try:
+            result = endpoint(**arguments)
+            if inspect.iscoroutine(result):
+                result = asyncio.run(result)
+        except HTTPException as e:
+            server_span.set_attribute("http.status_code", e.status_code)
+            raise ServiceError(e.status_code, e.detail)
+    if isinstance(result, StreamingResponse):
+        chunks = _iter_body(result)
+        return chunks if stream else b"".join(chunks)
+    return result
+
+
+app = FastAPI(
+    title="AI Procurement Assistant",
+    description="All backend services mounted in a single process.",
+)
+for _name, _mount_path in SERVICES.items():
+    app.mount(_mount_path, load_service(_name))
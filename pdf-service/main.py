@@ -1,5 +1,7 @@
 import io
 import json
+import base64
+import hashlib
 from datetime import datetime
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
@@ -12,11 +14,27 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 
+from common.json_stream import repair_json
+from common.shared_state import get_or_compute, get_store
+from common.tracing import TracingMiddleware, span
+import typography
+
 # Assuming pdf_utils.py is refactored into this file
 app = FastAPI(
     title="PDF Generation Service",
     description="Generates professional PDF documents from JSON data.",
 )
+app.add_middleware(TracingMiddleware, service="pdf-service")
+
+# Parse the Thai font once at startup rather than in the first bilingual request
+typography.register_fonts()
+
+# The frontend re-requests the comparison PDF on every rerun of step 3; cache it for all workers
+COMPARISON_PDF_CACHE_TTL = 600
+# Part of the cache key, so PDFs rendered by an older version are never served; bump it
+# whenever render_comparison_pdf or the fonts it uses change
+COMPARISON_PDF_RENDERER_VERSION = "2"
+store = get_store()
 
 class PdfRequest(BaseModel):
     content: Dict[str, Any]
@@ -27,81 +45,114 @@ class ComparisonPdfRequest(BaseModel):
     quotations_data: Dict[str, Any]
 
 
+FIELD_TRANSLATIONS = {
+    'Company Name': 'ชื่อบริษัท / Company Name', 'Company Address': 'ที่อยู่บริษัท / Address',
+    'Company Contact': 'ติดต่อ / Contact', 'Company Phone': 'โทรศัพท์ / Phone',
+    'Vendor Name': 'ชื่อผู้ขาย / Vendor Name', 'Total Price': 'ราคารวม / Total Price',
+    'Unit Price': 'ราคาต่อหน่วย / Unit Price', 'Quantity': 'จำนวน / Quantity',
+    'Description': 'รายละเอียด / Description', 'Payment Terms': 'เงื่อนไขการชำระเงิน / Payment Terms',
+    'Delivery Date': 'วันที่จัดส่ง / Delivery Date', 'Purchase Order': 'ใบสั่งซื้อ / Purchase Order',
+    'Requirements': 'ความต้องการ / Requirements', 'Generated At': 'สร้างเมื่อ / Generated At'
+}
+# Lowercased field names that format_field_name renders with a Thai label
+THAI_LABEL_FIELDS = [name.lower() for name in FIELD_TRANSLATIONS]
+
 def format_field_name(field_name):
     formatted = field_name.replace('_', ' ').title()
-    translations = {
-        'Company Name': 'ชื่อบริษัท / Company Name', 'Company Address': 'ที่อยู่บริษัท / Address',
-        'Company Contact': 'ติดต่อ / Contact', 'Company Phone': 'โทรศัพท์ / Phone',
-        'Vendor Name': 'ชื่อผู้ขาย / Vendor Name', 'Total Price': 'ราคารวม / Total Price',
-        'Unit Price': 'ราคาต่อหน่วย / Unit Price', 'Quantity': 'จำนวน / Quantity',
-        'Description': 'รายละเอียด / Description', 'Payment Terms': 'เงื่อนไขการชำระเงิน / Payment Terms',
-        'Delivery Date': 'วันที่จัดส่ง / Delivery Date', 'Purchase Order': 'ใบสั่งซื้อ / Purchase Order',
-        'Requirements': 'ความต้องการ / Requirements', 'Generated At': 'สร้างเมื่อ / Generated At'
-    }
-    return translations.get(formatted, formatted)
+    return FIELD_TRANSLATIONS.get(formatted, formatted)
+
+def needs_thai_font(*texts):
+    """Whether any text, or any field label format_field_name will produce from it, contains Thai."""
+    for text in texts:
+        if typography.contains_thai(text):
+            return True
+        normalized = text.lower().replace('_', ' ')
+        if any(field in normalized for field in THAI_LABEL_FIELDS):
+            return True
+    return False
+
+def create_section_story(section_key, section_value, normal_style, heading_style):
+    body_font, bold_font = normal_style.fontName, heading_style.fontName
+    story = [Paragraph(format_field_name(section_key), heading_style)]
+    if isinstance(section_value, list) and section_value and isinstance(section_value[0], dict):
+        all_keys = sorted(section_value[0].keys())
+        headers = [format_field_name(key) for key in all_keys]
+        table_data = [headers] + [[str(item.get(key, '')) if isinstance(item, dict) else str(item) for key in all_keys] for item in section_value]
+        table = Table(table_data, repeatRows=1)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#4682B4")),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke), ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 1), (-1, -1), body_font),
+            ('FONTNAME', (0, 0), (-1, 0), bold_font), ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12), ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor("#E6E6FA")),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)]))
+        story.append(table)
+    elif isinstance(section_value, dict) and section_value:
+        table_data = [[format_field_name(k), str(v)] for k, v in section_value.items()]
+        table = Table(table_data, colWidths=[2 * inch, 4 * inch])
+        table.setStyle(TableStyle([('BACKGROUND', (0, 0), (0, -1), colors.lightgrey), ('FONTNAME', (0, 0), (-1, -1), body_font),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black), ('ALIGN', (0, 0), (-1, -1), 'LEFT')]))
+        story.append(table)
+    else: story.append(Paragraph(str(section_value), normal_style))
+    story.append(Spacer(1, 0.2 * inch))
+    return story
 
 def create_tables_from_json(json_data, normal_style, heading_style):
     story = []
     if not isinstance(json_data, dict): return story
     for section_key, section_value in json_data.items():
-        story.append(Paragraph(format_field_name(section_key), heading_style))
-        if isinstance(section_value, list) and section_value and isinstance(section_value[0], dict):
-            all_keys = sorted(section_value[0].keys())
-            headers = [format_field_name(key) for key in all_keys]
-            table_data = [headers] + [[str(item.get(key, '')) for key in all_keys] for item in section_value]
-            table = Table(table_data, repeatRows=1)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#4682B4")),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke), ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'), ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12), ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor("#E6E6FA")),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)]))
-            story.append(table)
-        elif isinstance(section_value, dict):
-            table_data = [[format_field_name(k), str(v)] for k, v in section_value.items()]
-            table = Table(table_data, colWidths=[2 * inch, 4 * inch])
-            table.setStyle(TableStyle([('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black), ('ALIGN', (0, 0), (-1, -1), 'LEFT')]))
-            story.append(table)
-        else: story.append(Paragraph(str(section_value), normal_style))
-        story.append(Spacer(1, 0.2 * inch))
+        story.extend(create_section_story(section_key, section_value, normal_style, heading_style))
     return story
 
-@app.post("/generate-standard-pdf", summary="Generate a standard document PDF")
-def generate_standard_pdf(request: PdfRequest):
+def render_standard_pdf(request: PdfRequest):
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
     styles = getSampleStyleSheet()
     story = []
-    title_style = ParagraphStyle('CustomTitle', parent=styles['h1'], fontSize=18, spaceAfter=20, textColor=colors.HexColor("#000080"))
-    heading_style = ParagraphStyle('CustomHeading', parent=styles['h2'], fontSize=12, spaceAfter=10, textColor=colors.HexColor("#4682B4"))
-    normal_style = ParagraphStyle('CustomNormal', parent=styles['Normal'], fontSize=10, spaceAfter=8)
+    json_content_str = request.content.get('content', '{}')
+    content_text = json_content_str if isinstance(json_content_str, str) else json.dumps(json_content_str, ensure_ascii=False, default=str)
+    # English-only documents keep the built-in Helvetica and embed no font at all
+    body_font, bold_font = typography.document_fonts(needs_thai_font(request.title, request.doc_type, content_text))
+    title_style = ParagraphStyle('CustomTitle', parent=styles['h1'], fontName=bold_font, fontSize=18, spaceAfter=20, textColor=colors.HexColor("#000080"))
+    heading_style = ParagraphStyle('CustomHeading', parent=styles['h2'], fontName=bold_font, fontSize=12, spaceAfter=10, textColor=colors.HexColor("#4682B4"))
+    normal_style = ParagraphStyle('CustomNormal', parent=styles['Normal'], fontName=body_font, fontSize=10, spaceAfter=8)
     story.append(Paragraph(f"{request.doc_type}: {request.title}", title_style))
     story.append(Spacer(1, 0.25 * inch))
     
-    json_content_str = request.content.get('content', '{}')
     try:
-        json_content = json.loads(json_content_str) if isinstance(json_content_str, str) else json_content_str
-        story.extend(create_tables_from_json(json_content, normal_style, heading_style))
-    except (json.JSONDecodeError, TypeError):
+        json_content = json_content_str
+        if isinstance(json_content_str, str):
+            # Truncated or malformed model output is repaired rather than dumped as text
+            json_content = repair_json(json_content_str)
+            if not isinstance(json_content, dict):
+                raise ValueError("Content is not a JSON object.")
+        with span("pdf.create_tables_from_json", content_chars=len(content_text)):
+            story.extend(create_tables_from_json(json_content, normal_style, heading_style))
+    except (ValueError, TypeError):
+        # Only content without any JSON object falls back to a raw text dump
         story.append(Paragraph("Content:", heading_style))
         story.append(Paragraph(str(json_content_str).replace('\n', '<br/>'), normal_style))
 
     story.append(Spacer(1, 0.5 * inch))
     story.append(Paragraph(f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles['Italic']))
-    doc.build(story)
-    buffer.seek(0)
+    with span("pdf.doc_build", flowables=len(story), thai_font=body_font != typography.FALLBACK_FONT) as build_span:
+        doc.build(story)
+        build_span.set_attribute("pdf_bytes", buffer.tell())
+    return buffer.getvalue()
+
+@app.post("/generate-standard-pdf", summary="Generate a standard document PDF")
+def generate_standard_pdf(request: PdfRequest):
+    buffer = io.BytesIO(render_standard_pdf(request))
     return StreamingResponse(buffer, media_type="application/pdf", headers={"Content-Disposition": "attachment; filename=document.pdf"})
 
 
-@app.post("/generate-comparison-pdf", summary="Generate a vendor comparison PDF")
-def generate_comparison_pdf(request: ComparisonPdfRequest):
+def render_comparison_pdf(quotations_data):
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
     styles = getSampleStyleSheet()
+    body_font, bold_font = typography.document_fonts(typography.contains_thai(json.dumps(quotations_data, ensure_ascii=False, default=str)))
     story = [Paragraph("Vendor Quotation Comparison", styles['h1']), Spacer(1, 20)]
     
-    quotations_data = request.quotations_data
     if quotations_data:
         vendors = list(quotations_data.keys())
         comparison_data = {}
@@ -118,9 +169,26 @@ def generate_comparison_pdf(request: ComparisonPdfRequest):
         table = Table(table_data)
         table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.grey), ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'), ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'), ('GRID', (0, 0), (-1, -1), 1, colors.black)]))
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'), ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('FONTNAME', (0, 1), (-1, -1), body_font),
+            ('FONTNAME', (0, 0), (-1, 0), bold_font), ('GRID', (0, 0), (-1, -1), 1, colors.black)]))
         story.append(table)
-    doc.build(story)
-    buffer.seek(0)
+    with span("pdf.doc_build", flowables=len(story), thai_font=body_font != typography.FALLBACK_FONT) as build_span:
+        doc.build(story)
+        build_span.set_attribute("pdf_bytes", buffer.tell())
+    return buffer.getvalue()
+
+def _traced_comparison_pdf(quotations_data):
+    # Only cache misses render; a request without this span was served from the cache
+    with span("pdf.render_comparison", vendors=len(quotations_data or {})):
+        return render_comparison_pdf(quotations_data)
+
+@app.post("/generate-comparison-pdf", summary="Generate a vendor comparison PDF")
+def generate_comparison_pdf(request: ComparisonPdfRequest):
+    quotations_key = hashlib.sha256(json.dumps(request.quotations_data, sort_keys=True, default=str).encode()).hexdigest()
+    pdf_base64 = get_or_compute(
+        store, f"comparison-pdf:v{COMPARISON_PDF_RENDERER_VERSION}:{quotations_key}",
+        lambda: base64.b64encode(_traced_comparison_pdf(request.quotations_data)).decode(),
+        ttl=COMPARISON_PDF_CACHE_TTL
+    )
+    buffer = io.BytesIO(base64.b64decode(pdf_base64))
     return StreamingResponse(buffer, media_type="application/pdf", headers={"Content-Disposition": "attachment; filename=comparison.pdf"})
\ No newline at end of file
@@ -0,0 +1,55 @@
+import logging
+import os
+import re
+
+from reportlab.lib.fonts import addMapping
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont, TTFError
+
+logger = logging.getLogger(__name__)
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+
+# FiraGO (SIL OFL 1.1, see fonts/OFL.txt) covers Latin and Thai, so bilingual labels render in one font
+THAI_FONT = "FiraGO"
+THAI_FONT_BOLD = "FiraGO-Bold"
+FALLBACK_FONT = "Helvetica"
+FALLBACK_FONT_BOLD = "Helvetica-Bold"
+
+_THAI_CHARACTERS = re.compile("[\u0e00-\u0e7f]")
+
+_registered = None
+
+
+def register_fonts():
+    """
+    Parses the bundled TTFs once per process and returns the (regular, bold) font names to use.
+    ReportLab keeps the parsed metrics for every later document and embeds only a subset
+    with the glyphs each PDF actually uses. Falls back to Helvetica, which cannot render
+    Thai, if the font files are missing.
+    """
+    global _registered
+    if _registered is None:
+        try:
+            pdfmetrics.registerFont(TTFont(THAI_FONT, os.path.join(FONT_DIR, "FiraGO-Regular.ttf")))
+            pdfmetrics.registerFont(TTFont(THAI_FONT_BOLD, os.path.join(FONT_DIR, "FiraGO-Bold.ttf")))
+            # Lets <b> markup in paragraphs switch to the bold face
+            addMapping(THAI_FONT, 0, 0, THAI_FONT)
+            addMapping(THAI_FONT, 1, 0, THAI_FONT_BOLD)
+            addMapping(THAI_FONT, 0, 1, THAI_FONT)
+            addMapping(THAI_FONT, 1, 1, THAI_FONT_BOLD)
+            _registered = (THAI_FONT, THAI_FONT_BOLD)
+        except (OSError, TTFError) as e:
+            logger.warning("Thai font unavailable, Thai text will not render: %s", e)
+            _registered = (FALLBACK_FONT, FALLBACK_FONT_BOLD)
+    return _registered
+
+
+def contains_thai(text):
+    return bool(_THAI_CHARACTERS.search(text))
+
+
+def document_fonts(has_thai):
+    """(regular, bold) font names for one document: the Thai font only when it has Thai text,
+    since built-in Helvetica needs no embedding at all."""
+    return register_fonts() if has_thai else (FALLBACK_FONT, FALLBACK_FONT_BOLD)
@@ -1,18 +1,32 @@
 import openai
 import os
 import json
+import asyncio
+import functools
+import logging
+import weakref
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 
 # Assuming prompts.py is in the same directory
 import prompts
+from common.json_stream import IncrementalJSONParser
+from common.quotation_index import get_index, item_currency, quotation_currency, quotation_digest
+from common.rate_limiter import Priority, RateLimiter, estimate_tokens
+from common.shared_state import get_store
+from common.tracing import TracingMiddleware, span, start_span, use_span
+
+logger = logging.getLogger(__name__)
 
 # --- Configuration & Initialization ---
 app = FastAPI(
     title="Procurement Logic Service",
     description="Handles core procurement logic using OpenAI.",
 )
+app.add_middleware(TracingMiddleware, service="procurement-service")
 
 # It's better to fetch the API key once at startup
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -20,6 +34,24 @@ if not OPENAI_API_KEY:
     raise RuntimeError("OPENAI_API_KEY environment variable is not set.")
 
 openai.api_key = OPENAI_API_KEY
+# Retries are driven by the rate limiter below so that they keep their priority class.
+openai.max_retries = 0
+
+# Client-side limits for the OpenAI account; keep these at or slightly below the org's tier limits.
+OPENAI_RPM_LIMIT = float(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = float(os.getenv("OPENAI_TPM_LIMIT", "10000"))
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "4"))
+# Completion tokens reserved per call on top of the prompt; corrected from `usage` afterwards.
+OPENAI_COMPLETION_TOKEN_ESTIMATE = 1000
+
+openai_limiter = RateLimiter("openai", OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, store=get_store())
+# Threadpool workers that GENERATION and BULK calls may each occupy while waiting on the limiter or
+# OpenAI; further calls queue without holding a thread, so /chat always finds a free worker.
+OPENAI_MAX_BACKGROUND_CALLS = int(os.getenv("OPENAI_MAX_BACKGROUND_CALLS", "8"))
+
+# Price history added to vendor analyses: items looked up, and recent past quotes shown per item
+PRICE_HISTORY_MAX_ITEMS = int(os.getenv("PRICE_HISTORY_MAX_ITEMS", "20"))
+PRICE_HISTORY_ROWS_PER_ITEM = 3
 
 # --- Pydantic Models for Request Bodies ---
 class CallOpenAIRequest(BaseModel):
@@ -48,46 +80,259 @@ class ChatRequest(BaseModel):
     messages: List[Dict[str, str]]
     company_config: Dict[str, Any]
 
-# --- Helper Function ---
-def _call_openai(system_content: str, user_content: str, model: str = "gpt-4", temperature: float = 0.5) -> str:
+# --- Helper Functions ---
+def _open_chat_completion(messages: List[Dict[str, str]], model: str, temperature: float, priority: Priority, **options):
+    """
+    Calls the Chat Completions API through the shared rate limiter, retrying 429s after Retry-After.
+    Returns the parsed response (a chunk stream when stream=True), the tokens reserved for it and
+    its still open "openai.chat_completion" span, which the caller ends once the response is consumed.
+    """
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    reserved = sum(estimate_tokens(m.get("content") or "") for m in messages) + OPENAI_COMPLETION_TOKEN_ESTIMATE
+    call_span = start_span("openai.chat_completion", model=model, priority=priority.name,
+                           stream=bool(options.get("stream")), prompt_chars=prompt_chars)
+    try:
+        with use_span(call_span):
+            for attempt in range(OPENAI_MAX_ATTEMPTS):
+                with span("rate_limiter.acquire", limiter="openai", priority=priority.name, attempt=attempt):
+                    openai_limiter.acquire(priority, reserved)
+                try:
+                    raw_response = openai.chat.completions.with_raw_response.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        **options
+                    )
+                except openai.RateLimitError as e:
+                    # A rejected call used no tokens
+                    openai_limiter.reconcile(reserved, 0)
+                    retry_after = openai_limiter.update_from_headers(e.response.headers)
+                    if attempt == OPENAI_MAX_ATTEMPTS - 1:
+                        raise
+                    if retry_after is None:
+                        openai_limiter.back_off(2 ** attempt)
+                    continue
+                openai_limiter.update_from_headers(raw_response.headers)
+                return raw_response.parse(), reserved, call_span
+    except Exception as e:
+        call_span.end(e)
+        raise
+
+def _create_chat_completion(messages: List[Dict[str, str]], model: str, temperature: float, priority: Priority) -> str:
+    response, reserved, call_span = _open_chat_completion(messages, model, temperature, priority)
+    used_tokens = response.usage.total_tokens if response.usage else None
+    call_span.set_attribute("total_tokens", used_tokens)
+    call_span.end()
+    openai_limiter.reconcile(reserved, used_tokens)
+    return response.choices[0].message.content
+
+def _iter_completion_text(stream, reserved: int, call_span) -> Iterator[str]:
+    """
+    Yields the content deltas of a streamed completion. Its token usage is settled and `call_span`
+    ended when the stream finishes, fails or is abandoned (e.g. the client disconnects).
+    """
+    used_tokens = None
+    error = None
+    try:
+        for chunk in stream:
+            if chunk.usage:
+                used_tokens = chunk.usage.total_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        call_span.set_attribute("total_tokens", used_tokens)
+        call_span.end(error)
+        openai_limiter.reconcile(reserved, used_tokens)
+
+def _rate_limited_error(e: openai.RateLimitError) -> HTTPException:
+    retry_after = e.response.headers.get("retry-after", "1")
+    return HTTPException(status_code=429, detail=f"OpenAI rate limit exceeded: {str(e)}", headers={"Retry-After": retry_after})
+
+def _call_openai(system_content: str, user_content: str, model: str = "gpt-4", temperature: float = 0.5,
+                 priority: Priority = Priority.BULK) -> str:
     """Generic helper function to call the OpenAI Chat Completions API."""
     try:
-        response = openai.chat.completions.create(
-            model=model,
-            messages=[
+        return _create_chat_completion(
+            [
                 {"role": "system", "content": system_content},
                 {"role": "user", "content": user_content}
             ],
-            temperature=temperature
+            model, temperature, priority
         )
-        return response.choices[0].message.content
+    except openai.RateLimitError as e:
+        raise _rate_limited_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error communicating with OpenAI: {str(e)}")
+
+def _stream_document(system_content: str, user_content: str, temperature: float) -> StreamingResponse:
+    """
+    Streams a JSON document generation as NDJSON events: one `section` event per top-level
+    key as soon as it closes, then a `done` event carrying the raw content. Truncated or
+    malformed output is repaired, so the trailing sections are still emitted.
+    """
+    messages = [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": user_content}
+    ]
+    try:
+        stream, reserved, call_span = _open_chat_completion(messages, "gpt-4", temperature, Priority.GENERATION,
+                                                 stream=True, stream_options={"include_usage": True})
+    except openai.RateLimitError as e:
+        raise _rate_limited_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error communicating with OpenAI: {str(e)}")
 
+    def events():
+        parser = IncrementalJSONParser()
+        content = []
+        try:
+            for delta in _iter_completion_text(stream, reserved, call_span):
+                content.append(delta)
+                for key, value in parser.feed(delta):
+                    yield json.dumps({"event": "section", "key": key, "value": value}, ensure_ascii=False) + "\n"
+        except Exception as e:
+            yield json.dumps({"event": "error", "detail": f"Error communicating with OpenAI: {str(e)}"}) + "\n"
+        for key, value in parser.close():
+            yield json.dumps({"event": "section", "key": key, "value": value}, ensure_ascii=False) + "\n"
+        yield json.dumps({"event": "done", "content": "".join(content)}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+# Per event loop, since asyncio semaphores cannot be shared between loops (monolith mode runs one per call)
+_call_slots = weakref.WeakKeyDictionary()
+
+class _SlotHoldingBody:
+    """
+    Streamed response body that keeps a background call slot until it is exhausted, fails or is
+    dropped unread. Starlette reads a sync body in the threadpool, so each chunk still holds a
+    worker while it waits on OpenAI.
+    """
+
+    def __init__(self, body, slot: asyncio.Semaphore):
+        self._body = body.__aiter__()
+        self._release = weakref.finalize(self, slot.release)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._body.__anext__()
+        except BaseException:
+            # Includes StopAsyncIteration and cancellation; the finalizer releases only once
+            self._release()
+            raise
+
+def _background_call(priority: Priority):
+    """
+    Runs a sync endpoint in the threadpool once one of the OPENAI_MAX_BACKGROUND_CALLS slots of
+    its priority class is free. Waiting for a slot happens on the event loop, not in a worker thread.
+    A streamed response keeps its slot until the body has been sent.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def endpoint(*args, **kwargs):
+            slots = _call_slots.setdefault(asyncio.get_running_loop(), {})
+            if priority not in slots:
+                slots[priority] = asyncio.Semaphore(OPENAI_MAX_BACKGROUND_CALLS)
+            slot = slots[priority]
+            await slot.acquire()
+            try:
+                response = await run_in_threadpool(func, *args, **kwargs)
+            except BaseException:
+                slot.release()
+                raise
+            if isinstance(response, StreamingResponse):
+                response.body_iterator = _SlotHoldingBody(response.body_iterator, slot)
+            else:
+                slot.release()
+            return response
+        return endpoint
+    return decorator
+
+def _rfq_prompts(request: RFQRequest):
+    prompt = prompts.get_rfq_prompt(request.user_requirements, request.company_config)
+    system_prompt = "You are a professional procurement specialist generating detailed RFQ documents as JSON."
+    return system_prompt, prompt
+
+def _po_prompts(request: PORequest):
+    prompt = prompts.get_purchase_order_prompt(request.rfq_data, request.selected_vendor, request.recommendation_data, request.company_config)
+    system_prompt = "You are a procurement specialist creating precise purchase orders as JSON."
+    return system_prompt, prompt
+
 # --- API Endpoints ---
 @app.post("/generate-rfq", summary="Generate RFQ Document")
+@_background_call(Priority.GENERATION)
 def generate_rfq_endpoint(request: RFQRequest):
-    prompt = prompts.get_rfq_prompt(request.user_requirements, request.company_config)
-    system_prompt = "You are a professional procurement specialist generating detailed RFQ documents as JSON."
-    return {"content": _call_openai(system_prompt, prompt, temperature=0.7)}
+    system_prompt, prompt = _rfq_prompts(request)
+    return {"content": _call_openai(system_prompt, prompt, temperature=0.7, priority=Priority.GENERATION)}
+
+@app.post("/generate-rfq/stream", summary="Stream RFQ Document Sections")
+@_background_call(Priority.GENERATION)
+def generate_rfq_stream_endpoint(request: RFQRequest):
+    system_prompt, prompt = _rfq_prompts(request)
+    return _stream_document(system_prompt, prompt, temperature=0.7)
+
+def _price_history_for(quotations_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Past prices of the quoted items, excluding the quotations under analysis."""
+    index = get_index()
+    quotations = [q for q in quotations_data.values() if isinstance(q, dict)]
+    current = [quotation_digest(q) for q in quotations]
+    # (description, currency) pairs; past prices in another currency are not comparable
+    lookups = []
+    for quotation in quotations:
+        default_currency = quotation_currency(quotation)
+        items = quotation.get("items")
+        for item in items if isinstance(items, list) else []:
+            description = item.get("description") if isinstance(item, dict) else None
+            # Part numbers and the like may be extracted as numbers
+            lookup = (str(description), item_currency(item, default_currency)) if description else None
+            if lookup and lookup not in lookups:
+                lookups.append(lookup)
+    history = []
+    for description, currency in lookups[:PRICE_HISTORY_MAX_ITEMS]:
+        price_range = index.price_range(description, currency=currency, exclude_digests=current)
+        if price_range["count"]:
+            price_range["recent"] = index.price_history(description, currency=currency, exclude_digests=current,
+                                                        limit=PRICE_HISTORY_ROWS_PER_ITEM)
+            history.append(price_range)
+    return history
 
 @app.post("/analyze-quotes", summary="Analyze Vendor Quotations")
+@_background_call(Priority.BULK)
 def analyze_quotes_endpoint(request: AnalysisRequest):
-    prompt = prompts.get_vendor_analysis_prompt(request.quotations_data)
+    try:
+        with span("quotation_index.price_history"):
+            price_history = _price_history_for(request.quotations_data)
+    except Exception:
+        # The analysis is still useful without history
+        logger.exception("Price history lookup failed")
+        price_history = []
+    prompt = prompts.get_vendor_analysis_prompt(request.quotations_data, price_history)
     system_prompt = "You are an expert procurement analyst. Provide thorough, objective vendor analysis as a JSON object."
     return {"analysis": _call_openai(system_prompt, prompt, temperature=0.3)}
 
 @app.post("/extract-summary", summary="Extract Recommendation Summary")
+@_background_call(Priority.BULK)
 def extract_summary_endpoint(request: SummaryRequest):
     prompt = prompts.get_recommendation_summary_prompt(request.analysis_text)
     system_prompt = "You are a procurement analyst. Extract the final recommendation summary in both English and Thai."
     return {"summary": _call_openai(system_prompt, prompt, temperature=0.1)}
 
 @app.post("/generate-po", summary="Generate Purchase Order")
+@_background_call(Priority.GENERATION)
 def generate_po_endpoint(request: PORequest):
-    prompt = prompts.get_purchase_order_prompt(request.rfq_data, request.selected_vendor, request.recommendation_data, request.company_config)
-    system_prompt = "You are a procurement specialist creating precise purchase orders as JSON."
-    return {"content": _call_openai(system_prompt, prompt, temperature=0.2)}
+    system_prompt, prompt = _po_prompts(request)
+    return {"content": _call_openai(system_prompt, prompt, temperature=0.2, priority=Priority.GENERATION)}
+
+@app.post("/generate-po/stream", summary="Stream Purchase Order Sections")
+@_background_call(Priority.GENERATION)
+def generate_po_stream_endpoint(request: PORequest):
+    system_prompt, prompt = _po_prompts(request)
+    return _stream_document(system_prompt, prompt, temperature=0.2)
 
 @app.post("/chat", summary="Get Chatbot Response")
 def chat_endpoint(request: ChatRequest):
@@ -98,11 +343,8 @@ def chat_endpoint(request: ChatRequest):
 
     try:
         full_messages = [{"role": "system", "content": system_prompt}] + request.messages
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=full_messages,
-            temperature=0.7
-        )
-        return {"response": response.choices[0].message.content}
+        return {"response": _create_chat_completion(full_messages, "gpt-4", 0.7, Priority.INTERACTIVE)}
+    except openai.RateLimitError as e:
+        raise _rate_limited_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in chat communication: {str(e)}")
\ No newline at end of file
@@ -31,15 +31,22 @@ def get_recommendation_summary_prompt(analysis_text):
     Analysis: {analysis_text}
     """
 
-def get_vendor_analysis_prompt(quotations_data):
+def get_vendor_analysis_prompt(quotations_data, price_history=None):
     """Returns the prompt for analyzing vendor quotations."""
+    history_section = ""
+    if price_history:
+        history_section = f"""
+    Historical unit prices for these items from earlier quotations (use them in "price_analysis"
+    to flag prices above or below what we have paid before):
+    {json.dumps(price_history, indent=2, ensure_ascii=False)}
+    """
     return f"""
     Analyze the following vendor quotations and provide a comprehensive recommendation.
     Format the entire output as a single JSON object.
     The JSON should include keys like "vendor_comparison", "price_analysis",
     "risk_assessment", and "final_recommendation".
     Quotation Data: {json.dumps(quotations_data, indent=2)}
-    """
+    {history_section}"""
 
 def get_purchase_order_prompt(rfq_data, selected_vendor, recommendation_data, company_config):
     """Returns the prompt for generating a Purchase Order."""
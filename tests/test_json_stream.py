@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from common.json_stream import IncrementalJSONParser, repair_json
+
+
+def _feed_all(chunks):
+    """Feeds `chunks` one by one; returns the sections emitted by each feed, then by close()."""
+    parser = IncrementalJSONParser()
+    emitted = [parser.feed(chunk) for chunk in chunks]
+    emitted.append(parser.close())
+    return parser, emitted
+
+
+def test_valid_document_round_trips():
+    document = {"title": "RFQ", "items": [{"name": "Laptop", "qty": 2, "price": 1.5e3}], "urgent": False, "notes": None}
+    assert repair_json(json.dumps(document)) == document
+
+
+def test_truncated_string_is_closed():
+    assert repair_json('{"title": "Office lapt') == {"title": "Office lapt"}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"name": "caf\\u00e9 \\u0e01', "café ก"),
+    ('{"name": "a\\u0e', "a"),
+    ('{"name": "tab\\', "tab"),
+])
+def test_truncated_escapes_are_dropped(text, expected):
+    assert repair_json(text) == {"name": expected}
+
+
+@pytest.mark.parametrize("literal, expected", [
+    ("tru", True),
+    ("fa", False),
+    ("n", None),
+    ("1.5e", 1.5),
+    ("12.", 12),
+])
+def test_partial_literals_are_completed(literal, expected):
+    assert repair_json('{"a": 1, "b": ' + literal) == {"a": 1, "b": expected}
+
+
+def test_lone_minus_is_dropped():
+    assert repair_json('{"a": 1, "b": -') == {"a": 1}
+
+
+def test_missing_commas_are_inserted():
+    assert repair_json('{"a": 1 "b": [1 2 "x"] "c": {"d": true}}') == {"a": 1, "b": [1, 2, "x"], "c": {"d": True}}
+
+
+def test_trailing_commas_are_dropped():
+    assert repair_json('{"a": [1, 2,], "b": {"c": 3,},}') == {"a": [1, 2], "b": {"c": 3}}
+
+
+@pytest.mark.parametrize("text", ['{"a": 1, "b"', '{"a": 1, "b":', '{"a": 1, "b": ', '{"a": 1, "b'])
+def test_dangling_keys_are_dropped(text):
+    assert repair_json(text) == {"a": 1}
+
+
+def test_fenced_prose_is_ignored():
+    text = 'Here is the RFQ:\n```json\n{"title": "RFQ", "items": []}\n```\nLet me know if you need changes.'
+    assert repair_json(text) == {"title": "RFQ", "items": []}
+
+
+def test_text_without_json_gives_none():
+    assert repair_json("Sorry, I cannot help with that.") is None
+
+
+def test_root_array_is_parsed_without_sections():
+    parser, emitted = _feed_all(['[{"a": 1}, ', '{"b": 2}'])
+    assert parser.result == [{"a": 1}, {"b": 2}]
+    assert emitted == [[], [], []]
+
+
+def test_sections_are_emitted_in_the_chunk_where_they_close():
+    parser, emitted = _feed_all(['{"title": "R', 'FQ", "items": [1,', ' 2]', ', "terms": {"days": 30}}'])
+    assert emitted == [
+        [],
+        [("title", "RFQ")],
+        [("items", [1, 2])],
+        [("terms", {"days": 30})],
+        [],
+    ]
+    assert parser.result == {"title": "RFQ", "items": [1, 2], "terms": {"days": 30}}
+
+
+def test_literal_section_closes_at_the_following_delimiter():
+    parser, emitted = _feed_all(['{"qty": 12', '3', ', "ok": true', "}"])
+    assert emitted == [[], [], [("qty", 123)], [("ok", True)], []]
+
+
+def test_truncated_tail_section_is_emitted_on_close():
+    parser, emitted = _feed_all(['{"title": "RFQ", "items": [{"name": "Desk"}, {"name": "Ch'])
+    assert emitted == [[("title", "RFQ")], [("items", [{"name": "Desk"}, {"name": "Ch"}])]]
+
+
+def test_text_after_the_root_is_ignored():
+    parser, emitted = _feed_all(['{"a": 1}', ' and {"b": 2}'])
+    assert emitted == [[("a", 1)], [], []]
+    assert parser.result == {"a": 1}
@@ -0,0 +1,149 @@
+import sqlite3
+
+import pytest
+
+from common.quotation_index import (QuotationIndex, parse_amount, parse_currency, parse_date, quotation_currency,
+                                    quotation_digest)
+
+
+@pytest.fixture
+def index(tmp_path):
+    return QuotationIndex(str(tmp_path / "quotations.db"))
+
+
+def _quotation(vendor, date, *items, **extra):
+    return dict({"vendor_name": vendor, "quote_details": {"date": date},
+                 "items": [dict(zip(("description", "unit_price"), item)) for item in items]}, **extra)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (1200, 1200.0),
+    (12.5, 12.5),
+    ("฿1,234.50", 1234.5),
+    ("1,234.50 THB", 1234.5),
+    ("1,234,567", 1234567.0),
+    ("1.234,50 €", 1234.5),
+    ("1.234.567", 1234567.0),
+    ("12,5 kg", 12.5),
+    ("10 pcs", 10.0),
+    ("-5", -5.0),
+    ("2-3 weeks", None),
+    ("฿1,000 – 2,000", None),
+    ("TBD", None),
+    (None, None),
+    (True, None),
+])
+def test_parse_amount(value, expected):
+    assert parse_amount(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("฿1,234.50", "THB"),
+    ("500 บาท", "THB"),
+    ("USD 1,000", "USD"),
+    ("1,000 thb", "THB"),
+    ("$99", "USD"),
+    ("S$99", "SGD"),
+    ("HK$99", "HKD"),
+    ("1.234,50 €", "EUR"),
+    ("£20", "GBP"),
+    ("¥500", "JPY"),
+    ("1,234.50", None),
+    (1234.5, None),
+])
+def test_parse_currency(value, expected):
+    assert parse_currency(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-03-05", "2024-03-05"),
+    ("05/03/2024", "2024-03-05"),
+    ("March 5, 2024", "2024-03-05"),
+    ("5 Mar 2024", "2024-03-05"),
+    ("2024-03-05T10:30:00", "2024-03-05"),
+    ("next week", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_date(value, expected):
+    assert parse_date(value) == expected
+
+
+def test_quotation_currency_falls_back_to_totals():
+    assert quotation_currency({"items": [{"unit_price": "100"}], "totals": {"grand_total": "฿1,070"}}) == "THB"
+    assert quotation_currency({"items": "none", "totals": ["x"]}) is None
+
+
+def test_unit_price_is_derived_from_total_and_quantity(index):
+    index.ingest({"vendor_name": "A", "items": [{"description": "Desk", "quantity": "4 pcs", "total_price": "฿10,000"}]})
+    [row] = index.price_history("desk")
+    assert row["unit_price"] == 2500.0
+    assert row["currency"] == "THB"
+
+
+def test_identical_quotation_is_ingested_once(index):
+    quotation = _quotation("A", "2024-01-10", ("Desk", "฿100"))
+    assert index.ingest(quotation)
+    assert not index.ingest(dict(quotation))
+    assert index.price_range("desk")["count"] == 1
+
+
+def test_every_word_must_match(index):
+    index.ingest(_quotation("A", "2024-01-10", ("Dell laptop 14 inch", "$1,000"), ("27 inch 4K monitor", "$300")))
+    assert index.price_range("HP laptop 15 inch")["count"] == 0
+    assert index.price_range("Laptop DELL")["count"] == 1
+    assert [row["description"] for row in index.price_history("inch")] == ["27 inch 4K monitor", "Dell laptop 14 inch"]
+
+
+def test_thai_words_match_whole(index):
+    index.ingest(_quotation("A", "2024-01-10", ("คอมพิวเตอร์โน้ตบุ๊ก Lenovo", "25,000 บาท"), ("กระดาษ A4", "120 บาท")))
+    assert index.price_range("คอมพิวเตอร์โน้ตบุ๊ก")["count"] == 1
+    assert index.price_range("คอมพิวเตอร์โน้ตบุ๊ก Dell")["count"] == 0
+
+
+def test_ranges_are_grouped_by_currency(index):
+    index.ingest(_quotation("A", "2024-01-10", ("Office chair", "฿2,000"), ("Office chair", "฿3,000")))
+    index.ingest(_quotation("B", "2024-02-20", ("Office chair", "$90")))
+    summary = index.price_range("office chair")
+    assert summary["count"] == 3
+    thb, usd = summary["ranges"]
+    assert (thb["currency"], thb["count"], thb["min_unit_price"], thb["max_unit_price"], thb["avg_unit_price"]) == \
+        ("THB", 2, 2000.0, 3000.0, 2500.0)
+    assert (usd["currency"], usd["count"], usd["first_date"], usd["vendors"]) == ("USD", 1, "2024-02-20", 1)
+    assert [r["currency"] for r in index.price_range("office chair", currency="usd")["ranges"]] == ["USD"]
+    assert {row["currency"] for row in index.price_history("office chair", currency="THB")} == {"THB"}
+
+
+def test_exclude_digests_skips_the_quotations_under_analysis(index):
+    past = _quotation("A", "2023-06-01", ("Printer toner", "฿1,500"))
+    current = _quotation("B", "2024-06-01", ("Printer toner", "฿1,900"))
+    index.ingest_many([past, current])
+    summary = index.price_range("printer toner", exclude_digests=[quotation_digest(current)])
+    assert summary["count"] == 1
+    assert summary["ranges"][0]["max_unit_price"] == 1500.0
+    assert len(index.price_history("printer toner", exclude_digests=[quotation_digest(current)])) == 1
+
+
+def test_malformed_sections_are_ignored(index):
+    assert index.ingest({"vendor_info": "A", "quote_details": ["x"], "totals": 5,
+                         "items": [{"description": 12345, "unit_price": "฿100"}, "junk"]})
+    [row] = index.price_history("12345")
+    assert (row["vendor"], row["quote_date"], row["unit_price"]) == ("Unknown", None, 100.0)
+
+
+def test_descriptions_without_words_match_nothing(index):
+    index.ingest(_quotation("A", "2024-01-10", ("Desk", "฿100")))
+    assert index.price_range("-- ?") == {"item": "-- ?", "count": 0, "ranges": []}
+    assert index.price_history('"') == []
+
+
+def test_index_files_without_currency_are_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE line_item (id INTEGER PRIMARY KEY, quotation_id INTEGER NOT NULL, vendor TEXT NOT NULL, "
+                 "vendor_norm TEXT NOT NULL, quote_date TEXT, description TEXT NOT NULL, quantity REAL, "
+                 "unit_price REAL, total_price REAL, raw_unit_price TEXT)")
+    conn.close()
+    index = QuotationIndex(path)
+    index.ingest(_quotation("A", "2024-01-10", ("Desk", "฿100")))
+    assert index.price_history("desk")[0]["currency"] == "THB"
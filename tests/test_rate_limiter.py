@@ -0,0 +1,139 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from common.rate_limiter import Priority, RateLimiter, parse_duration
+from common.shared_state import SQLiteStore
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def _wake(limiter):
+    with limiter._cond:
+        limiter._cond.notify_all()
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_parse_duration():
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1.5") == 1.5
+    assert parse_duration(None) is None
+    assert parse_duration("soon") is None
+
+
+def test_waiters_are_served_by_priority_then_fifo(clock):
+    limiter = RateLimiter("test", requests_per_minute=60, clock=clock)
+    for _ in range(60):
+        limiter.acquire(Priority.BULK)
+    served = []
+
+    def caller(priority, label):
+        limiter.acquire(priority)
+        served.append(label)
+
+    arrivals = [(Priority.BULK, "bulk-1"), (Priority.GENERATION, "generation"),
+                (Priority.BULK, "bulk-2"), (Priority.INTERACTIVE, "interactive")]
+    threads = []
+    for priority, label in arrivals:
+        thread = threading.Thread(target=caller, args=(priority, label), daemon=True)
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: len(limiter._waiters) == len(threads))
+
+    for expected in range(1, len(arrivals) + 1):
+        clock.advance(1.0)  # one request per second refills
+        _wake(limiter)
+        _wait_for(lambda: len(served) == expected)
+    for thread in threads:
+        thread.join(1)
+    assert served == ["interactive", "generation", "bulk-1", "bulk-2"]
+
+
+def test_retry_after_blocks_every_caller(clock):
+    limiter = RateLimiter("test", requests_per_minute=600, clock=clock)
+    assert limiter.update_from_headers({"retry-after": "5"}) == 5
+    assert limiter._try_take(0) == pytest.approx(5)
+    clock.advance(5)
+    assert limiter._try_take(0) == 0
+
+
+def test_retry_after_ms_takes_precedence(clock):
+    limiter = RateLimiter("test", requests_per_minute=600, clock=clock)
+    assert limiter.update_from_headers({"retry-after-ms": "250", "retry-after": "5"}) == pytest.approx(0.25)
+    assert limiter._try_take(0) == pytest.approx(0.25)
+
+
+def test_headers_lower_but_never_raise_the_buckets(clock):
+    limiter = RateLimiter("test", requests_per_minute=60, tokens_per_minute=6000, clock=clock)
+    limiter.update_from_headers({"x-ratelimit-remaining-requests": "0", "x-ratelimit-remaining-tokens": "6000"})
+    assert limiter._try_take(0) == pytest.approx(1.0)
+
+    clock.advance(60)
+    limiter.update_from_headers({"x-ratelimit-remaining-tokens": "100"})
+    assert limiter._try_take(1000) == pytest.approx(9.0)  # 900 tokens at 100 per second
+    assert limiter.update_from_headers({"x-ratelimit-remaining-requests": "1000"}) is None
+
+
+def test_reconcile_returns_unused_tokens(clock):
+    limiter = RateLimiter("test", requests_per_minute=600, tokens_per_minute=600, clock=clock)
+    limiter.acquire(Priority.BULK, tokens=600)
+    assert limiter._try_take(100) > 0
+    # e.g. a call rejected with a 429 used none of its reservation
+    limiter.reconcile(600, 0)
+    assert limiter._try_take(100) == 0
+
+
+def _contend(store_path, priority, callers, results):
+    """Child process: `callers` threads acquire one request each at `priority`."""
+    limiter = RateLimiter("shared", requests_per_minute=6000, store=SQLiteStore(store_path))
+
+    def call():
+        limiter.acquire(priority)
+        results.put((int(priority), time.time()))
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_priority_is_honoured_across_processes(tmp_path):
+    store_path = str(tmp_path / "state.db")
+    # Nobody may call for the next 1.5 s, so both processes queue up
+    RateLimiter("shared", requests_per_minute=6000, store=SQLiteStore(store_path)).back_off(1.5)
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    bulk = context.Process(target=_contend, args=(store_path, Priority.BULK, 3, results))
+    interactive = context.Process(target=_contend, args=(store_path, Priority.INTERACTIVE, 3, results))
+    bulk.start()
+    time.sleep(0.5)  # the bulk callers are already waiting when the interactive ones arrive
+    interactive.start()
+    served = sorted((results.get(timeout=10) for _ in range(6)), key=lambda result: result[1])
+    bulk.join(5)
+    interactive.join(5)
+    assert [priority for priority, _ in served] == [Priority.INTERACTIVE] * 3 + [Priority.BULK] * 3